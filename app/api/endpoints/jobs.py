@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, ConfigDict
+from app.services.jobs import submit_job, get_job
+from app.services.scheduler import run_blocking
+
+router = APIRouter()
+
+class JobRequest(BaseModel):
+    url: str
+    model_config = ConfigDict(json_schema_extra={})
+
+@router.post("/", status_code=202)
+async def create_job(job_request: JobRequest):
+    try:
+        job = await submit_job(job_request.url)
+        return {"job_id": job.id, "status": job.status}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str):
+    job = await run_blocking(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
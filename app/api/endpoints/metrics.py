@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from app.services.blob_storage_service import get_blob_cache_stats
+from app.services.scheduler import pipeline_scheduler, run_blocking
+from app.services.azure_clients import azure_client_registry
+from app.services.language import get_language_detection_stats
+from app.services.translation_memory import translation_memory
+
+router = APIRouter()
+
+@router.get("/blob-cache")
+async def blob_cache_stats():
+    return get_blob_cache_stats()
+
+@router.get("/scheduler")
+async def scheduler_stats():
+    return pipeline_scheduler.stats()
+
+@router.get("/azure-clients")
+async def azure_client_stats():
+    return azure_client_registry.stats()
+
+@router.get("/language-detection")
+async def language_detection_stats():
+    return get_language_detection_stats()
+
+@router.get("/translation-memory")
+async def translation_memory_stats():
+    return await run_blocking(translation_memory.stats)
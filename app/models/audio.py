@@ -0,0 +1,17 @@
+from typing import Optional
+from pydantic import BaseModel, ConfigDict
+
+class AudioPart(BaseModel):
+    filename: str  # Nombre con extensión, usado también como nombre del archivo enviado a Whisper
+    file_data: bytes
+    start_ms: int
+    end_ms: int
+    blob_url: Optional[str] = None  # Solo si la parte se guardó en Blob Storage
+    model_config = ConfigDict(json_schema_extra={})
+
+class SilenceMap(BaseModel):
+    duration_ms: int
+    leading_ms: int  # Silencio al inicio del audio
+    trailing_ms: int  # Silencio al final del audio
+    regions: list[tuple[int, int]]  # Silencios internos como (inicio_ms, fin_ms)
+    model_config = ConfigDict(json_schema_extra={})
@@ -0,0 +1,20 @@
+from typing import Optional
+from pydantic import BaseModel, ConfigDict
+
+class BatchItem(BaseModel):
+    job_id: Optional[str] = None
+    video_id: str
+    url: str
+    title: Optional[str] = None
+    status: str = "queued"  # queued, running, completed, failed, blocked
+    stage: Optional[str] = None
+    blob_url: Optional[str] = None
+    error: Optional[str] = None
+    model_config = ConfigDict(json_schema_extra={})
+
+class BatchStatus(BaseModel):
+    batch_id: str
+    status: str  # running, completed
+    items: list[BatchItem]
+    counts: dict[str, int]
+    model_config = ConfigDict(json_schema_extra={})
@@ -0,0 +1,12 @@
+from typing import Optional
+from pydantic import BaseModel, ConfigDict
+
+class ContentSafetyVerdict(BaseModel):
+    blocked: bool
+    severities: dict[str, int]  # Severidad máxima por categoría entre las partes analizadas
+    block_severity: int  # Umbral a partir del cual se bloquea el contenido
+    offending_part: Optional[int] = None  # Índice de la parte que superó el umbral
+    offending_category: Optional[str] = None
+    parts_total: int
+    parts_scanned: int
+    model_config = ConfigDict(json_schema_extra={})
@@ -0,0 +1,16 @@
+from typing import Optional
+from pydantic import BaseModel, ConfigDict
+
+class Job(BaseModel):
+    id: str
+    url: str
+    video_id: Optional[str] = None
+    title: Optional[str] = None
+    batch_id: Optional[str] = None  # Lote al que pertenece el trabajo, si lo hay
+    status: str = "queued"  # queued, running, completed, failed, blocked
+    stage: Optional[str] = None  # Etapa del proceso en curso (metadata, transcription, ...)
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    model_config = ConfigDict(json_schema_extra={})
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, ConfigDict
+
+class LanguageDetection(BaseModel):
+    language: str  # Código ISO 639-1 del idioma predominante
+    counts: dict[str, int]  # Partes analizadas por idioma
+    parts_total: int
+    parts_analyzed: int
+    parts_local: int = 0  # Partes clasificadas por el identificador local, sin llamar a Azure
+    requests: int  # Llamadas realizadas a Text Analytics
+    early_stop: bool = False  # Si se dejó de analizar porque la mayoría ya estaba decidida
+    model_config = ConfigDict(json_schema_extra={})
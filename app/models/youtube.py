@@ -0,0 +1,21 @@
+from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+class VideoMetadata(BaseModel):
+    id: str
+    title: str
+    duration: Optional[float] = None  # Segundos
+    language: Optional[str] = None  # Idioma original del video, si YouTube lo informa
+    webpage_url: str
+    formats: list[dict] = []
+    subtitles: dict[str, list[dict]] = {}  # Subtítulos subidos por el creador, por idioma
+    automatic_captions: dict[str, list[dict]] = {}  # Subtítulos generados automáticamente, por idioma
+    info: dict = Field(default={}, exclude=True)  # Diccionario completo de yt-dlp, para reutilizarlo sin volver a extraer
+    model_config = ConfigDict(json_schema_extra={})
+
+class CaptionTrack(BaseModel):
+    language: str
+    kind: str  # 'manual' (subidos por el creador) o 'auto' (generados automáticamente)
+    ext: str  # json3, vtt, srv3...
+    url: str
+    model_config = ConfigDict(json_schema_extra={})
@@ -1,9 +1,18 @@
 import os
+import csv
+import shutil
+import subprocess
+import tempfile
 from pathlib import Path
+from typing import Iterable, Iterator
 from pydub import AudioSegment
-from app.utils.file_utils import print_styled_message, milliseconds_until_sound
-from app.services.blob_storage_service import upload_file_to_blob, download_file_from_blob, delete_file_from_blob
+from app.utils.file_utils import print_styled_message, milliseconds_until_sound, detect_silence_map
+from app.services.blob_storage_service import (
+    upload_file_to_blob, upload_stream_to_blob, download_file_from_blob, delete_file_from_blob,
+    get_blob_metadata, set_blob_metadata
+)
 from app.models.blob_storage import FileUploadRequest
+from app.models.audio import AudioPart, SilenceMap
 from io import BytesIO
 from urllib.parse import urlparse
 
@@ -11,140 +20,405 @@ from urllib.parse import urlparse
 ffmpeg_path = os.getenv('FFMPEG_PATH', 'ffmpeg')
 AudioSegment.converter = ffmpeg_path
 
-def trim_start(blob_url: str, silence_threshold_in_decibels=-20.0, min_silence_len=2000):
+# Guardar o no en Blob Storage los audios intermedios (recortado y partes)
+persist_audio_intermediates = os.getenv('PERSIST_AUDIO_INTERMEDIATES', 'false').lower() == 'true'
+
+# Backend de procesamiento: 'pydub' decodifica en memoria, 'ffmpeg' segmenta en streaming
+audio_backend = os.getenv('AUDIO_BACKEND', 'pydub')
+# Modo de recorte en trim_start: 'metadata' (solo registra el desplazamiento),
+# 'copy' (copia del flujo sin recodificar) o 'reencode' (decodifica y recodifica)
+audio_trim_mode = os.getenv('AUDIO_TRIM_MODE', 'metadata')
+# Metadato del blob donde se registra el desplazamiento inicial que se aplica al decodificar
+TRIM_METADATA_KEY = 'trim_start_ms'
+# Segundos iniciales que se analizan para detectar el silencio sin decodificar todo el archivo
+audio_trim_scan_seconds = int(os.getenv('AUDIO_TRIM_SCAN_SECONDS', '600'))
+
+# Perfiles de codificación para las partes que se envían a Whisper (voz: mono a 16 kHz)
+TRANSCRIPTION_PROFILES = {
+    'opus': {'format': 'ogg', 'codec': 'libopus', 'bitrate': '24k', 'parameters': ['-application', 'voip']},
+    'mp3': {'format': 'mp3', 'bitrate': '32k'},
+    'flac': {'format': 'flac'},
+    'wav': {'format': 'wav'},
+}
+transcription_profile = os.getenv('TRANSCRIPTION_AUDIO_PROFILE', 'opus')
+transcription_frame_rate = 16000
+transcription_channels = 1
+
+# División alineada con silencios: duración objetivo de cada parte y solapamiento entre partes
+audio_chunk_target_ms = int(float(os.getenv('AUDIO_CHUNK_TARGET_SECONDS', '180')) * 1000)
+audio_chunk_overlap_ms = int(os.getenv('AUDIO_CHUNK_OVERLAP_MS', '0'))
+audio_chunk_search_window_ms = int(float(os.getenv('AUDIO_CHUNK_SEARCH_WINDOW_SECONDS', '20')) * 1000)
+chunk_silence_threshold = float(os.getenv('AUDIO_CHUNK_SILENCE_THRESHOLD_DB', '-40'))
+chunk_min_silence_len = 300
+
+def plan_chunks(duration_ms: int, silence_map: SilenceMap, target_ms: int, search_window_ms: int = None, overlap_ms: int = 0) -> list[tuple[int, int]]:
     """
-    Recorta el silencio inicial de un archivo de audio si es mayor a 2 segundos.
+    Calcula los límites (inicio_ms, fin_ms) de cada parte cortando en el silencio más largo
+    que haya a `search_window_ms` o menos de la duración objetivo. Si no hay silencios en la
+    ventana se corta en la duración objetivo. Cada parte, salvo la primera, empieza
+    `overlap_ms` antes del corte para no perder palabras en los límites.
     """
-    try:
-        # Descargar el archivo de Blob Storage
+    search_window_ms = audio_chunk_search_window_ms if search_window_ms is None else search_window_ms
+    target_ms = max(target_ms, 1)
+    search_window_ms = min(search_window_ms, target_ms // 2)
+
+    cuts = []
+    start = 0
+    while duration_ms - start > target_ms + search_window_ms:
+        ideal = start + target_ms
+        candidates = [
+            (end - begin, (begin + end) // 2)
+            for begin, end in silence_map.regions
+            if ideal - search_window_ms <= (begin + end) // 2 <= ideal + search_window_ms
+        ]
+        # Preferir el silencio más largo y, a igual duración, el más cercano al objetivo
+        cut = max(candidates, key=lambda c: (c[0], -abs(c[1] - ideal)))[1] if candidates else ideal
+        cuts.append(cut)
+        start = cut
+
+    edges = [0] + cuts + [duration_ms]
+    return [
+        (max(0, edges[i] - overlap_ms) if i > 0 else 0, edges[i + 1])
+        for i in range(len(edges) - 1)
+    ]
+
+def export_with_profile(segment: AudioSegment, profile: dict) -> bytes:
+    """
+    Codifica un segmento en memoria con el formato, códec y bitrate del perfil.
+    """
+    buffer = BytesIO()
+    options = {key: profile[key] for key in ('codec', 'bitrate', 'parameters') if key in profile}
+    segment.export(buffer, format=profile['format'], **options)
+    return buffer.getvalue()
+
+def estimate_encoded_size(segment: AudioSegment, profile: dict) -> int:
+    """
+    Estima el tamaño codificado a partir del bitrate del perfil o, si no lo tiene, del PCM.
+    """
+    bitrate = profile.get('bitrate')
+    if bitrate:
+        bits_per_second = int(bitrate.rstrip('k')) * 1000
+        return int(len(segment) / 1000 * bits_per_second / 8)
+    return len(segment.raw_data)
+
+class AudioPipeline:
+    """
+    Decodifica un archivo de audio una sola vez y aplica en memoria el recorte,
+    el remuestreo y la división en partes listas para transcribir.
+    Los audios intermedios solo se suben a Blob Storage si `persist_intermediates` es True.
+    """
+
+    def __init__(self, audio: AudioSegment, filename: str, source_path: Path = None, persist_intermediates: bool = None):
+        self.audio = audio
+        self.filename = filename
+        self.source_path = source_path
+        self.persist_intermediates = persist_audio_intermediates if persist_intermediates is None else persist_intermediates
+        self._silence_maps = {}
+
+    @classmethod
+    def from_blob(cls, blob_url: str, persist_intermediates: bool = None, start_ms: int = 0) -> "AudioPipeline":
+        """
+        Descarga el archivo de Blob Storage y lo decodifica una única vez,
+        empezando en `start_ms` si se indica un desplazamiento inicial.
+        """
         path = download_file_from_blob(blob_url)
-        parsed_url = urlparse(blob_url)
-        filename = Path(parsed_url.path).name
-        audio = AudioSegment.from_file(path, format="mp3")
+        filename = Path(urlparse(blob_url).path).name
+        if start_ms:
+            audio = AudioSegment.from_file(path, start_second=start_ms / 1000)
+        else:
+            audio = AudioSegment.from_file(path)
+        return cls(audio, filename, source_path=path, persist_intermediates=persist_intermediates)
 
-        # Detectar el silencio inicial
-        start_trim = milliseconds_until_sound(audio, silence_threshold_in_decibels)
+    @property
+    def stem(self) -> str:
+        return Path(self.filename).stem
 
-        # Si el silencio inicial es mayor a 2 segundos, recortar el audio
-        if start_trim > min_silence_len:
-            print_styled_message("Recortando el silencio inicial del audio...")
-            trimmed = audio[start_trim:] if start_trim < len(audio) else audio
+    def silence_map(self, silence_threshold_in_decibels=-20.0, min_silence_len=500) -> SilenceMap:
+        """
+        Devuelve el mapa de silencios del audio actual, calculado una sola vez por umbral.
+        """
+        key = (silence_threshold_in_decibels, min_silence_len)
+        if key not in self._silence_maps:
+            self._silence_maps[key] = detect_silence_map(self.audio, silence_threshold_in_decibels, min_silence_len)
+        return self._silence_maps[key]
 
-            # Exportar el audio recortado en memoria
-            buffer = BytesIO()
-            trimmed.export(buffer, format="mp3")
-            buffer.seek(0)
-            file_data = buffer.read()
-
-            # Subir el archivo recortado a Blob Storage
-            file_request = FileUploadRequest(
-                filename=f"trimmed_{filename}",
-                file_data=file_data
-            )
-            trimmed_blob_url = upload_file_to_blob(file_request)
+    def _set_audio(self, audio: AudioSegment) -> None:
+        # Cualquier cambio en el audio invalida los mapas de silencio calculados
+        self.audio = audio
+        self._silence_maps = {}
+
+    def trim_leading_silence(self, silence_threshold_in_decibels=-20.0, min_silence_len=2000) -> bool:
+        """
+        Recorta en memoria el silencio inicial si es mayor a `min_silence_len` milisegundos.
+        """
+        start_trim = self.silence_map(silence_threshold_in_decibels).leading_ms
+
+        if start_trim <= min_silence_len or start_trim >= len(self.audio):
+            print_styled_message("No se encontró un silencio inicial mayor a 2 segundos. No se recortará el audio.")
+            return False
+
+        print_styled_message("Recortando el silencio inicial del audio...")
+        self._set_audio(self.audio[start_trim:])
+        self.filename = f"trimmed_{self.filename}"
+
+        if self.persist_intermediates:
+            trimmed_blob_url = self._persist(self.filename, self.audio, Path(self.filename).suffix[1:] or "mp3")
             print_styled_message(f"Audio recortado guardado en Blob Storage: {trimmed_blob_url}")
+        return True
+
+    def resample(self, frame_rate: int = None, channels: int = None) -> "AudioPipeline":
+        """
+        Cambia en memoria la frecuencia de muestreo y/o el número de canales.
+        """
+        if frame_rate and self.audio.frame_rate != frame_rate:
+            self._set_audio(self.audio.set_frame_rate(frame_rate))
+        if channels and self.audio.channels != channels:
+            self._set_audio(self.audio.set_channels(channels))
+        return self
+
+    def split(self, max_size_mb: int = 25, profile: str = None, target_chunk_ms: int = None, overlap_ms: int = None) -> list[AudioPart]:
+        """
+        Divide el audio en partes codificadas con el perfil indicado (ver `TRANSCRIPTION_PROFILES`)
+        que no superen el tamaño máximo permitido, medido sobre los bytes ya codificados.
+
+        Si `target_chunk_ms` es mayor que 0, los cortes se buscan en los silencios cercanos
+        a esa duración y cada parte puede solaparse `overlap_ms` con la anterior; en caso
+        contrario se corta en partes iguales según el tamaño estimado.
+        """
+        audio = self.audio
+        profile = TRANSCRIPTION_PROFILES[profile or transcription_profile]
+        target_chunk_ms = audio_chunk_target_ms if target_chunk_ms is None else target_chunk_ms
+        overlap_ms = audio_chunk_overlap_ms if overlap_ms is None else overlap_ms
+        max_size_bytes = int(max_size_mb * 1024 * 1024)
+        estimated_size = estimate_encoded_size(audio, profile)
 
-            return trimmed_blob_url, True
+        if target_chunk_ms and len(audio) > 0:
+            # No superar la duración que cabe en el tamaño máximo (con margen para el solapamiento)
+            max_chunk_ms = max(1000, int(max_size_bytes / (estimated_size / len(audio))) - overlap_ms)
+            silence_map = self.silence_map(chunk_silence_threshold, chunk_min_silence_len)
+            boundaries = plan_chunks(len(audio), silence_map, min(target_chunk_ms, max_chunk_ms), overlap_ms=overlap_ms)
         else:
-            print_styled_message("No se encontró un silencio inicial mayor a 2 segundos. No se recortará el audio.")
-            return blob_url, False
-    except Exception as e:
-        print_styled_message(f"Error al recortar el audio: {str(e)}")
-        raise
+            num_parts = estimated_size // max_size_bytes + (1 if estimated_size % max_size_bytes != 0 else 0)
+            num_parts = max(num_parts, 1)
+            part_duration_ms = len(audio) // num_parts
+            boundaries = [
+                (i * part_duration_ms, len(audio) if i == num_parts - 1 else (i + 1) * part_duration_ms)
+                for i in range(num_parts)
+            ]
 
-def convert_audio_to_wav(input_url: str) -> str:
-    """
-    Convierte un archivo de audio a formato WAV.
-    """
-    try:
-        # Descargar el archivo de Blob Storage
-        path = download_file_from_blob(input_url)
-        audio = AudioSegment.from_file(path)
+        # Codificar cada parte y volver a dividir las que superen el límite una vez codificadas
+        encoded = []
+        for start_time, end_time in boundaries:
+            encoded.extend(self._encode_within_limit(start_time, end_time, profile, max_size_bytes))
 
-        # Extraer el nombre y extensión del archivo
-        parsed_url = urlparse(input_url)
-        filename = Path(parsed_url.path).name
-        stem = Path(filename).stem
-        output_filename = stem + '.wav'
-
-        # Exportar el audio a WAV en memoria
-        buffer = BytesIO()
-        audio.export(buffer, format='wav')
-        buffer.seek(0)
-        file_data = buffer.read()
-
-        # Subir el archivo WAV a Blob Storage
-        file_request = FileUploadRequest(
-            filename=output_filename,
-            file_data=file_data
+        num_parts = len(encoded)
+        if num_parts > 1:
+            print_styled_message(f"Dividiendo audio en {num_parts} partes...")
+
+        audio_parts = []
+        for i, (start_time, end_time, file_data) in enumerate(encoded):
+            extension = profile['format']
+            part_filename = f"{self.stem}_part{i+1}.{extension}" if num_parts > 1 else f"{self.stem}.{extension}"
+            part = AudioPart(filename=part_filename, file_data=file_data, start_ms=start_time, end_ms=end_time)
+            if self.persist_intermediates:
+                part.blob_url = upload_file_to_blob(FileUploadRequest(filename=part.filename, file_data=part.file_data))
+            audio_parts.append(part)
+
+        return audio_parts
+
+    def _encode_within_limit(self, start_time: int, end_time: int, profile: dict, max_size_bytes: int) -> list[tuple[int, int, bytes]]:
+        """
+        Codifica el tramo indicado y, si excede `max_size_bytes`, lo parte por la mitad y repite.
+        """
+        file_data = export_with_profile(self.audio[start_time:end_time], profile)
+        if len(file_data) <= max_size_bytes or end_time - start_time <= 1000:
+            return [(start_time, end_time, file_data)]
+
+        middle = (start_time + end_time) // 2
+        return (
+            self._encode_within_limit(start_time, middle, profile, max_size_bytes)
+            + self._encode_within_limit(middle, end_time, profile, max_size_bytes)
         )
-        wav_blob_url = upload_file_to_blob(file_request)
-        print_styled_message(f"Archivo WAV guardado en Blob Storage: {wav_blob_url}")
 
-        return wav_blob_url
-    except Exception as e:
-        print_styled_message(f"Error al convertir el archivo de audio: {str(e)}")
-        raise
+    def _persist(self, filename: str, segment: AudioSegment, format: str) -> str:
+        file_request = FileUploadRequest(filename=filename, file_data=export_with_profile(segment, {'format': format}))
+        return upload_file_to_blob(file_request)
 
-def split_audio(file_url: str, max_size_mb: int = 25) -> list[str]:
+def prepare_transcription_parts(file_url: str, trim: bool = False, backend: str = None,
+                                trim_mode: str = None) -> tuple[Path, Iterable[AudioPart]]:
     """
-    Divide un archivo de audio en partes más pequeñas si excede el tamaño máximo permitido.
+    Descarga el audio y devuelve la ruta local junto con las partes listas para Whisper,
+    usando el backend configurado. Con 'ffmpeg' las partes se generan de forma incremental.
+
+    Si el blob tiene registrado un desplazamiento inicial (ver `trim_start`) se aplica al
+    decodificar y no se vuelve a buscar el silencio. Con `trim_mode` 'copy' o 'reencode'
+    (`AUDIO_TRIM_MODE` por defecto) el silencio se recorta antes en un nuevo blob, que es
+    el que se decodifica.
     """
-    try:
-        # Descargar el archivo de Blob Storage
+    backend = backend or audio_backend
+    trim_mode = trim_mode or audio_trim_mode
+    recorded_start_ms = int(get_blob_metadata(file_url).get(TRIM_METADATA_KEY, 0))
+
+    if trim and not recorded_start_ms and trim_mode != 'metadata':
+        file_url, _ = trim_start(file_url, mode=trim_mode)
+        trim = False
+
+    if backend == 'ffmpeg':
+        start_ms = recorded_start_ms
+        if trim and not recorded_start_ms:
+            trim_start(file_url, mode='metadata')
+            start_ms = int(get_blob_metadata(file_url).get(TRIM_METADATA_KEY, 0))
         file_path = download_file_from_blob(file_url)
-        audio = AudioSegment.from_file(file_path)
-        max_size_bytes = max_size_mb * 1024 * 1024
+        return file_path, stream_audio_segments(file_path, Path(urlparse(file_url).path).stem, start_ms=start_ms)
 
-        if len(audio.raw_data) <= max_size_bytes:
-            return [file_url]
+    pipeline = AudioPipeline.from_blob(file_url, start_ms=recorded_start_ms)
 
-        num_parts = len(audio.raw_data) // max_size_bytes + (1 if len(audio.raw_data) % max_size_bytes != 0 else 0)
-        part_duration_ms = len(audio) // num_parts
+    # Pasar a mono a 16 kHz antes de analizar y codificar: es suficiente para voz
+    pipeline.resample(transcription_frame_rate, transcription_channels)
 
-        audio_parts = []
-        print_styled_message(f"Dividiendo audio en {num_parts} partes...")
+    if trim and not recorded_start_ms:
+        pipeline.trim_leading_silence()
+
+    return pipeline.source_path, pipeline.split()
+
+def detect_leading_silence_ms(file_path: Path, silence_threshold_in_decibels=-20.0, min_silence_len=2000) -> int:
+    """
+    Calcula el silencio inicial decodificando solo los primeros `audio_trim_scan_seconds` segundos.
+    Devuelve 0 si el silencio no supera `min_silence_len` milisegundos.
+    """
+    prefix = AudioSegment.from_file(file_path, duration=audio_trim_scan_seconds)
+    prefix = prefix.set_frame_rate(transcription_frame_rate).set_channels(transcription_channels)
+    start_trim = milliseconds_until_sound(prefix, silence_threshold_in_decibels)
+    return start_trim if min_silence_len < start_trim < len(prefix) else 0
+
+def stream_audio_segments(input_path: Path, stem: str, start_ms: int = 0, profile: str = None,
+                          max_size_mb: int = 25, segment_ms: int = None) -> Iterator[AudioPart]:
+    """
+    Divide el audio con ffmpeg en modo segmento, sin cargar el PCM completo en memoria.
+
+    ffmpeg lee el archivo en streaming y escribe cada parte en un directorio temporal; cada
+    parte se entrega en cuanto ffmpeg la cierra, de modo que la transcripción puede empezar
+    mientras se generan las siguientes. Los cortes son de duración fija (no se alinean con silencios).
+    """
+    profile = TRANSCRIPTION_PROFILES[profile or transcription_profile]
+    bitrate = profile.get('bitrate')
+    bytes_per_second = int(bitrate.rstrip('k')) * 1000 / 8 if bitrate else transcription_frame_rate * transcription_channels * 2
+    max_segment_ms = int(max_size_mb * 1024 * 1024 / bytes_per_second * 1000 * 0.95)
+    segment_ms = min(segment_ms or audio_chunk_target_ms or max_segment_ms, max_segment_ms)
+
+    extension = profile['format']
+    work_dir = Path(tempfile.mkdtemp(prefix=f"{stem}_segments_", dir="/tmp"))
+    command = [ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin']
+    if start_ms:
+        command += ['-ss', f"{start_ms / 1000:.3f}"]
+    command += ['-i', str(input_path), '-vn', '-ac', str(transcription_channels), '-ar', str(transcription_frame_rate)]
+    if 'codec' in profile:
+        command += ['-c:a', profile['codec']]
+    if bitrate:
+        command += ['-b:a', bitrate]
+    command += profile.get('parameters', [])
+    command += [
+        '-f', 'segment', '-segment_format', extension, '-segment_time', f"{segment_ms / 1000:.3f}",
+        '-reset_timestamps', '1', '-segment_list', 'pipe:1', '-segment_list_type', 'csv',
+        str(work_dir / f"{stem}_part%04d.{extension}")
+    ]
+
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+        try:
+            # ffmpeg escribe una línea "archivo,inicio,fin" cada vez que termina una parte
+            rows = (row for row in csv.reader(process.stdout) if row)
+            for index, row in enumerate(rows, 1):
+                segment_path = work_dir / row[0]
+                part = AudioPart(
+                    filename=f"{stem}_part{index}.{extension}",
+                    file_data=segment_path.read_bytes(),
+                    start_ms=start_ms + int(float(row[1]) * 1000),
+                    end_ms=start_ms + int(float(row[2]) * 1000)
+                )
+                segment_path.unlink(missing_ok=True)
+                if persist_audio_intermediates:
+                    part.blob_url = upload_file_to_blob(FileUploadRequest(filename=part.filename, file_data=part.file_data))
+                yield part
 
-        # Extraer el nombre y extensión del archivo
-        parsed_url = urlparse(file_url)
+            if process.wait() != 0:
+                stderr_file.seek(0)
+                error = stderr_file.read().decode('utf-8', errors='replace').strip()
+                raise RuntimeError(f"ffmpeg terminó con código {process.returncode}: {error}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def trim_start(blob_url: str, silence_threshold_in_decibels=-20.0, min_silence_len=2000, mode: str = None):
+    """
+    Recorta el silencio inicial de un archivo de audio si es mayor a 2 segundos.
+
+    Modos (`AUDIO_TRIM_MODE` por defecto):
+    - 'metadata': no reescribe el audio; registra el desplazamiento en los metadatos del
+      blob para que las etapas siguientes lo apliquen al decodificar.
+    - 'copy': corta sin recodificar (copia del flujo en el límite de trama más cercano).
+    - 'reencode': decodifica, recorta y recodifica a MP3 el archivo completo.
+
+    Retorna la URL del audio a usar y si se recortó.
+    """
+    mode = mode or audio_trim_mode
+    try:
+        # Descargar el archivo de Blob Storage
+        path = download_file_from_blob(blob_url)
+        parsed_url = urlparse(blob_url)
         filename = Path(parsed_url.path).name
-        stem = Path(filename).stem
-        suffix = Path(filename).suffix
 
-        for i in range(num_parts):
-            start_time = i * part_duration_ms
-            end_time = min((i + 1) * part_duration_ms, len(audio))
+        if mode == 'reencode':
+            audio = AudioSegment.from_file(path)
+            start_trim = milliseconds_until_sound(audio, silence_threshold_in_decibels)
+            start_trim = start_trim if min_silence_len < start_trim < len(audio) else 0
+        else:
+            # Solo se decodifica el comienzo del archivo para buscar el silencio
+            start_trim = detect_leading_silence_ms(path, silence_threshold_in_decibels, min_silence_len)
+
+        if not start_trim:
+            print_styled_message("No se encontró un silencio inicial mayor a 2 segundos. No se recortará el audio.")
+            return blob_url, False
 
-            part = audio[start_time:end_time]
-            part_filename = f"{stem}_part{i+1}{suffix}"
+        print_styled_message("Recortando el silencio inicial del audio...")
 
-            # Exportar la parte de audio en memoria
-            buffer = BytesIO()
-            part.export(buffer, format=suffix[1:])
-            buffer.seek(0)
-            file_data = buffer.read()
-
-            # Subir cada parte a Blob Storage
-            file_request = FileUploadRequest(
-                filename=part_filename,
-                file_data=file_data
-            )
-            part_url = upload_file_to_blob(file_request)
-            audio_parts.append(part_url)
+        if mode == 'metadata':
+            set_blob_metadata(blob_url, {TRIM_METADATA_KEY: start_trim})
+            print_styled_message(f"Desplazamiento inicial de {start_trim} ms registrado en los metadatos del blob")
+            return blob_url, True
 
-        return audio_parts
+        trimmed_filename = f"trimmed_{filename}"
+        if mode == 'copy':
+            trimmed_path = stream_copy_trim(path, Path("/tmp") / trimmed_filename, start_trim)
+            with open(trimmed_path, 'rb') as trimmed_file:
+                trimmed_blob_url = upload_stream_to_blob(trimmed_filename, trimmed_file)
+            trimmed_path.unlink(missing_ok=True)
+        else:
+            # Exportar el audio recortado en memoria
+            buffer = BytesIO()
+            audio[start_trim:].export(buffer, format="mp3")
+            file_request = FileUploadRequest(filename=trimmed_filename, file_data=buffer.getvalue())
+            trimmed_blob_url = upload_file_to_blob(file_request)
 
+        print_styled_message(f"Audio recortado guardado en Blob Storage: {trimmed_blob_url}")
+        return trimmed_blob_url, True
     except Exception as e:
-        print_styled_message(f"Error al dividir el audio: {str(e)}")
+        print_styled_message(f"Error al recortar el audio: {str(e)}")
         raise
 
-def convert_audio(input_path: str, output_path: str, format: str = 'mp3'):
+def stream_copy_trim(input_path: Path, output_path: Path, start_ms: int) -> Path:
     """
-    Convierte un archivo de audio a otro formato usando Pydub y FFmpeg.
+    Descarta los primeros `start_ms` milisegundos copiando el flujo de audio sin recodificarlo.
+    El corte cae en la trama o paquete más cercano del contenedor original.
     """
-    audio = AudioSegment.from_file(input_path)
-    audio.export(output_path, format=format)
+    command = [
+        ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+        '-ss', f"{start_ms / 1000:.3f}", '-i', str(input_path),
+        '-map', '0:a', '-c', 'copy', str(output_path)
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg terminó con código {result.returncode}: {result.stderr.strip()}")
     return output_path
-
-# Ejemplo de uso
-# convert_audio('/path/to/input/file.wav', '/path/to/output/file.mp3')
\ No newline at end of file
@@ -1,34 +1,181 @@
+import asyncio
 import os
+import aiohttp
+import httpx
 from dotenv import load_dotenv
 from azure.core.credentials import AzureKeyCredential
-from azure.ai.contentsafety import ContentSafetyClient
-from azure.ai.textanalytics import TextAnalyticsClient
-from openai import AzureOpenAI
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.ai.contentsafety.aio import ContentSafetyClient
+from azure.ai.textanalytics.aio import TextAnalyticsClient
+from openai import AsyncAzureOpenAI
+from app.utils.file_utils import print_styled_message
 
 load_dotenv()
 
-def initialize_azure_clients():
-    whisper_client = AzureOpenAI(
-        azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
-        api_key=os.getenv('AZURE_OPENAI_API_KEY'),
-        api_version="2024-06-01"
-    )
-    ai_client = TextAnalyticsClient(
-        endpoint=os.getenv('AI_SERVICE_ENDPOINT'),
-        credential=AzureKeyCredential(os.getenv('AI_SERVICE_KEY'))
-    )
-    content_safety_client = ContentSafetyClient(
-        endpoint=os.getenv('AZURE_CONTENT_SAFETY_ENDPOINT'),
-        credential=AzureKeyCredential(os.getenv('AZURE_CONTENT_SAFETY_KEY'))
-    )
-    gpt_client = AzureOpenAI(
-        azure_endpoint=os.getenv('AZURE_GPT_ENDPOINT'),
-        api_key=os.getenv('AZURE_GPT_API_KEY'),
-        api_version="2023-09-15-preview"
-    )
-    return {
-        'whisper': whisper_client,
-        'ai': ai_client,
-        'content_safety': content_safety_client,
-        'gpt': gpt_client
-    }
\ No newline at end of file
+try:
+    import h2  # noqa: F401  Necesario para HTTP/2 en httpx
+    http2_available = True
+except ImportError:
+    http2_available = False
+
+# Ajustes de los grupos de conexiones compartidos por todos los clientes
+http_max_connections = int(os.getenv('AZURE_HTTP_MAX_CONNECTIONS', '100'))
+http_keepalive_seconds = float(os.getenv('AZURE_HTTP_KEEPALIVE_SECONDS', '60'))
+http_timeout_seconds = float(os.getenv('AZURE_HTTP_TIMEOUT_SECONDS', '120'))
+http2_enabled = os.getenv('AZURE_HTTP2', 'true').lower() == 'true' and http2_available
+
+class AzureClientRegistry:
+    """
+    Clientes de los servicios de Azure que viven lo mismo que la aplicación.
+
+    Los clientes de OpenAI y el de Translator comparten un `httpx.AsyncClient` (HTTP/2 si está
+    disponible) y los clientes del SDK de Azure comparten una sesión de aiohttp, de modo que las
+    conexiones TLS se reutilizan entre peticiones en lugar de abrirse en cada llamada.
+    """
+
+    def __init__(self):
+        self.clients = None
+        self._http_client = None
+        self._aiohttp_session = None
+        self._lock = None
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.requests_sent = 0
+
+    async def start(self) -> dict:
+        """
+        Crea los clientes si aún no existen y los retorna.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.clients is None:
+                self.clients = self._build_clients()
+        return self.clients
+
+    async def get(self) -> dict:
+        return self.clients if self.clients is not None else await self.start()
+
+    def _build_clients(self) -> dict:
+        self._http_client = httpx.AsyncClient(
+            http2=http2_enabled,
+            timeout=httpx.Timeout(http_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=http_max_connections,
+                max_keepalive_connections=http_max_connections,
+                keepalive_expiry=http_keepalive_seconds
+            ),
+            event_hooks={'request': [self._count_request]}
+        )
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._count_new_connection)
+        trace_config.on_connection_reuseconn.append(self._count_reused_connection)
+        trace_config.on_request_start.append(self._count_aiohttp_request)
+        self._aiohttp_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=http_max_connections, keepalive_timeout=http_keepalive_seconds),
+            timeout=aiohttp.ClientTimeout(total=http_timeout_seconds),
+            trace_configs=[trace_config]
+        )
+
+        whisper_client = AsyncAzureOpenAI(
+            azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
+            api_key=os.getenv('AZURE_OPENAI_API_KEY'),
+            api_version="2024-06-01",
+            http_client=self._http_client
+        )
+        ai_client = TextAnalyticsClient(
+            endpoint=os.getenv('AI_SERVICE_ENDPOINT'),
+            credential=AzureKeyCredential(os.getenv('AI_SERVICE_KEY')),
+            transport=AioHttpTransport(session=self._aiohttp_session, session_owner=False)
+        )
+        content_safety_client = ContentSafetyClient(
+            endpoint=os.getenv('AZURE_CONTENT_SAFETY_ENDPOINT'),
+            credential=AzureKeyCredential(os.getenv('AZURE_CONTENT_SAFETY_KEY')),
+            transport=AioHttpTransport(session=self._aiohttp_session, session_owner=False)
+        )
+        gpt_client = AsyncAzureOpenAI(
+            azure_endpoint=os.getenv('AZURE_GPT_ENDPOINT'),
+            api_key=os.getenv('AZURE_GPT_API_KEY'),
+            api_version="2023-09-15-preview",
+            http_client=self._http_client
+        )
+        return {
+            'whisper': whisper_client,
+            'ai': ai_client,
+            'content_safety': content_safety_client,
+            'gpt': gpt_client,
+            'translator': self._http_client
+        }
+
+    async def warm_up(self) -> None:
+        """
+        Abre de antemano una conexión con cada servicio para que la primera petición real no
+        pague el establecimiento de TLS. Los errores solo se registran.
+        """
+        clients = await self.get()
+        httpx_endpoints = [os.getenv('AZURE_OPENAI_ENDPOINT'), os.getenv('AZURE_GPT_ENDPOINT'), os.getenv('AZURE_TRANSLATOR_ENDPOINT')]
+        aiohttp_endpoints = [os.getenv('AI_SERVICE_ENDPOINT'), os.getenv('AZURE_CONTENT_SAFETY_ENDPOINT')]
+
+        async def warm_httpx(endpoint):
+            await clients['translator'].head(endpoint, timeout=10)
+
+        async def warm_aiohttp(endpoint):
+            async with self._aiohttp_session.head(endpoint, timeout=aiohttp.ClientTimeout(total=10)):
+                pass
+
+        calls = [warm_httpx(endpoint) for endpoint in dict.fromkeys(httpx_endpoints) if endpoint]
+        calls += [warm_aiohttp(endpoint) for endpoint in dict.fromkeys(aiohttp_endpoints) if endpoint]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        failed = [result for result in results if isinstance(result, Exception)]
+        for error in failed:
+            print_styled_message(f"No se pudo precalentar la conexión: {str(error)}")
+        print_styled_message(f"Conexiones con Azure precalentadas: {len(results) - len(failed)}/{len(results)}")
+
+    async def close(self) -> None:
+        """
+        Cierra los clientes y sus grupos de conexiones al detener la aplicación.
+        """
+        if self.clients is None:
+            return
+        await self.clients['ai'].close()
+        await self.clients['content_safety'].close()
+        await self._aiohttp_session.close()
+        await self._http_client.aclose()
+        self.clients = None
+
+    async def _count_request(self, request: httpx.Request) -> None:
+        self.requests_sent += 1
+
+    async def _count_aiohttp_request(self, session, context, params) -> None:
+        self.requests_sent += 1
+
+    async def _count_new_connection(self, session, context, params) -> None:
+        self.connections_created += 1
+
+    async def _count_reused_connection(self, session, context, params) -> None:
+        self.connections_reused += 1
+
+    def stats(self) -> dict:
+        """
+        Devuelve el estado de los grupos de conexiones compartidos.
+        """
+        httpx_connections = []
+        if self._http_client is not None:
+            pool = getattr(self._http_client._transport, '_pool', None)
+            httpx_connections = list(getattr(pool, 'connections', []))
+        connector = self._aiohttp_session.connector if self._aiohttp_session is not None else None
+        return {
+            "started": self.clients is not None,
+            "http2": http2_enabled,
+            "max_connections": http_max_connections,
+            "keepalive_seconds": http_keepalive_seconds,
+            "requests_sent": self.requests_sent,
+            "httpx_open_connections": len(httpx_connections),
+            "httpx_idle_connections": sum(1 for connection in httpx_connections if connection.is_idle()),
+            "aiohttp_connections_created": self.connections_created,
+            "aiohttp_connections_reused": self.connections_reused,
+            "aiohttp_connector_limit": connector.limit if connector is not None else None,
+        }
+
+azure_client_registry = AzureClientRegistry()
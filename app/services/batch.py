@@ -0,0 +1,83 @@
+import uuid
+import yt_dlp
+from typing import Optional
+from app.models.batch import BatchItem, BatchStatus
+from app.services.youtube import extract_video_id
+from app.services.jobs import job_store, submit_job
+from app.services.scheduler import run_blocking, run_network
+from app.utils.file_utils import print_styled_message
+
+def expand_urls(urls: list[str], playlist_url: Optional[str] = None) -> list[BatchItem]:
+    """
+    Convierte URLs de videos y listas de reproducción en elementos únicos por ID de video.
+    Las listas se expanden con una extracción "plana" de yt-dlp (sin metadatos de cada video).
+    """
+    sources = list(urls) + ([playlist_url] if playlist_url else [])
+    items = {}
+
+    with yt_dlp.YoutubeDL({'quiet': True, 'extract_flat': 'in_playlist'}) as ydl:
+        for source in sources:
+            video_id = extract_video_id(source)
+            if video_id and 'list=' not in source:
+                items.setdefault(video_id, BatchItem(video_id=video_id, url=f"https://www.youtube.com/watch?v={video_id}"))
+                continue
+
+            info_dict = ydl.extract_info(source, download=False)
+            for entry in info_dict.get('entries') or [info_dict]:
+                entry_id = entry.get('id') if entry else None
+                if not entry_id:
+                    continue
+                items.setdefault(entry_id, BatchItem(
+                    video_id=entry_id,
+                    url=f"https://www.youtube.com/watch?v={entry_id}",
+                    title=entry.get('title')
+                ))
+
+    return list(items.values())
+
+async def create_batch(urls: list[str], playlist_url: Optional[str] = None) -> BatchStatus:
+    """
+    Crea un lote con un trabajo por video, programados en la capacidad de trabajo compartida.
+    """
+    items = await run_network(expand_urls, urls, playlist_url)
+    if not items:
+        raise ValueError("No se encontraron videos en las URLs indicadas")
+
+    batch_id = uuid.uuid4().hex
+    for item in items:
+        await submit_job(item.url, video_id=item.video_id, title=item.title, batch_id=batch_id)
+
+    print_styled_message(f"Lote {batch_id} creado con {len(items)} videos")
+    return await run_blocking(get_batch, batch_id)
+
+def get_batch(batch_id: str) -> Optional[BatchStatus]:
+    """
+    Devuelve el estado del lote con el estado de cada elemento, o None si no existe.
+    """
+    jobs = job_store.list_by_batch(batch_id)
+    if not jobs:
+        return None
+
+    items = [
+        BatchItem(
+            job_id=job.id,
+            video_id=job.video_id,
+            url=job.url,
+            title=job.title,
+            status=job.status,
+            stage=job.stage,
+            blob_url=(job.result or {}).get("blob_url"),
+            error=job.error
+        )
+        for job in jobs
+    ]
+    counts = {}
+    for item in items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    finished = sum(counts.get(status, 0) for status in ("completed", "failed", "blocked"))
+    return BatchStatus(
+        batch_id=batch_id,
+        status="completed" if finished == len(items) else "running",
+        items=items,
+        counts=counts
+    )
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+class BlobCache:
+    """
+    Caché local en disco para blobs, indexada por nombre del blob + ETag.
+
+    Los archivos se guardan con el hash de la clave como nombre y se expulsan por
+    LRU cuando el tamaño total supera `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # clave -> tamaño en bytes
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """
+        Reconstruye el índice a partir de los archivos existentes, del más antiguo al más reciente.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = [f for f in self.directory.iterdir() if f.is_file() and not f.name.endswith('.tmp')]
+        for cached_file in sorted(files, key=lambda f: f.stat().st_mtime):
+            size = cached_file.stat().st_size
+            self._entries[cached_file.name] = size
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def _key(blob_name: str, etag: str) -> str:
+        normalized_etag = etag.strip('"')
+        return hashlib.sha256(f"{blob_name}\0{normalized_etag}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def get(self, blob_name: str, etag: str, destination: Path) -> Optional[Path]:
+        """
+        Materializa el archivo en caché en `destination` (enlace duro o copia) y retorna esa ruta,
+        o None si no existe. Se hace bajo el candado para que una expulsión concurrente no borre
+        el archivo entre la consulta y el enlace.
+        """
+        key = self._key(blob_name, etag)
+        with self._lock:
+            size = self._entries.get(key)
+            if size is not None:
+                path = self._path(key)
+                try:
+                    os.utime(path)
+                    destination = link_or_copy(path, destination)
+                except FileNotFoundError:
+                    self._forget(key)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.bytes_saved += size
+                    return destination
+            self.misses += 1
+            return None
+
+    def reserve(self, blob_name: str, etag: str) -> Path:
+        """
+        Devuelve una ruta temporal dentro de la caché para escribir un blob antes de registrarlo con `commit`.
+        """
+        key = self._key(blob_name, etag)
+        return self.directory / f"{key}.{threading.get_ident()}.tmp"
+
+    def commit(self, blob_name: str, etag: str, temp_path: Path) -> Path:
+        """
+        Registra en la caché un archivo escrito en una ruta obtenida con `reserve`.
+        """
+        key = self._key(blob_name, etag)
+        path = self._path(key)
+        with self._lock:
+            os.replace(temp_path, path)
+            size = path.stat().st_size
+            if key in self._entries:
+                self._total_bytes -= self._entries[key]
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._total_bytes += size
+            self._evict()
+        return path
+
+    def put_bytes(self, blob_name: str, etag: str, data: bytes) -> Path:
+        """
+        Guarda en la caché el contenido de un blob (escritura directa tras una subida).
+        """
+        temp_path = self.reserve(blob_name, etag)
+        with open(temp_path, "wb") as cached_file:
+            cached_file.write(data)
+        return self.commit(blob_name, etag, temp_path)
+
+    def put_file(self, blob_name: str, etag: str, source_path: Path) -> Path:
+        """
+        Guarda en la caché una copia de un archivo local ya existente.
+        """
+        temp_path = self.reserve(blob_name, etag)
+        link_or_copy(source_path, temp_path)
+        return self.commit(blob_name, etag, temp_path)
+
+    def rekey(self, blob_name: str, old_etag: str, new_etag: str) -> None:
+        """
+        Reasigna una entrada a un nuevo ETag cuando el blob cambió solo en sus metadatos.
+        Si ya existe una entrada para el nuevo ETag, se conserva esa y se descarta la anterior.
+        """
+        old_key = self._key(blob_name, old_etag)
+        new_key = self._key(blob_name, new_etag)
+        with self._lock:
+            if old_key not in self._entries:
+                return
+            if new_key in self._entries:
+                self._forget(old_key)
+                self._path(old_key).unlink(missing_ok=True)
+                return
+            try:
+                os.replace(self._path(old_key), self._path(new_key))
+            except FileNotFoundError:
+                self._forget(old_key)
+                return
+            self._entries[new_key] = self._entries.pop(old_key)
+
+    def _forget(self, key: str) -> None:
+        self._total_bytes -= self._entries.pop(key, 0)
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            self._path(key).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        """
+        Devuelve los contadores de uso de la caché.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_saved": self.bytes_saved,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+def link_or_copy(source: Path, destination: Path) -> Path:
+    """
+    Crea un enlace duro de `source` en `destination` o lo copia si no es posible.
+    """
+    destination = Path(destination)
+    destination.unlink(missing_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+    return destination
+
+blob_cache = BlobCache(
+    directory=os.getenv('BLOB_CACHE_DIR', '/tmp/blob_cache'),
+    max_bytes=int(os.getenv('BLOB_CACHE_MAX_MB', '2048')) * 1024 * 1024,
+)
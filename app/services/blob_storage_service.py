@@ -1,6 +1,12 @@
 import os
-from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
+import base64
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient, BlobBlock
 from app.models.blob_storage import FileUploadRequest
+from app.services.blob_cache import blob_cache, link_or_copy
 from dotenv import load_dotenv
 from pathlib import Path
 from urllib.parse import urlparse, unquote
@@ -19,8 +25,18 @@ container_name = os.getenv("AZURE_BLOB_CONTAINER_NAME")
 if not container_name:
     raise ValueError("La variable de entorno AZURE_BLOB_CONTAINER_NAME no está configurada")
 
+# Parámetros de transferencia por bloques (tamaño de bloque y paralelismo)
+blob_block_size = int(os.getenv('AZURE_BLOB_BLOCK_SIZE_MB', '4')) * 1024 * 1024
+blob_max_concurrency = int(os.getenv('AZURE_BLOB_MAX_CONCURRENCY', '4'))
+
 # Inicializar el cliente de Blob Storage
-blob_service_client = BlobServiceClient.from_connection_string(azure_blob_connection_string)
+blob_service_client = BlobServiceClient.from_connection_string(
+    azure_blob_connection_string,
+    max_block_size=blob_block_size,
+    max_single_put_size=blob_block_size,
+    max_single_get_size=blob_block_size,
+    max_chunk_get_size=blob_block_size,
+)
 container_client = blob_service_client.get_container_client(container_name)
 
 def upload_file_to_blob(file_request: FileUploadRequest) -> str:
@@ -30,7 +46,10 @@ def upload_file_to_blob(file_request: FileUploadRequest) -> str:
     """
     try:
         blob_client = container_client.get_blob_client(file_request.filename)
-        blob_client.upload_blob(file_request.file_data, overwrite=True)
+        result = blob_client.upload_blob(file_request.file_data, overwrite=True, max_concurrency=blob_max_concurrency)
+
+        # Escritura directa en la caché local para no volver a descargar lo que acabamos de subir
+        blob_cache.put_bytes(file_request.filename, result['etag'], file_request.file_data)
 
         # Construir la URL completa del blob
         blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{container_name}/{file_request.filename}"
@@ -38,6 +57,71 @@ def upload_file_to_blob(file_request: FileUploadRequest) -> str:
     except Exception as e:
         raise RuntimeError(f"Error al subir el archivo a Blob Storage: {str(e)}")
 
+def upload_stream_to_blob(filename: str, source: Union[BinaryIO, Iterable[bytes]], max_concurrency: int = None) -> str:
+    """
+    Sube a Blob Storage el contenido de un objeto tipo archivo o de un iterador de bytes.
+
+    El contenido se divide en bloques que se suben en paralelo (stage_block) y se
+    confirman al final (commit_block_list), de modo que nunca hay en memoria más de
+    `max_concurrency` bloques a la vez. Retorna la URL pública del blob.
+    """
+    max_concurrency = max_concurrency or blob_max_concurrency
+    try:
+        blob_client = container_client.get_blob_client(filename)
+        block_list = []
+        temp_path = None
+
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="blob-upload") as executor:
+            pending = set()
+            # El archivo temporal de la caché se usa para la escritura directa mientras se sube
+            temp_path = blob_cache.reserve(filename, "upload")
+            with open(temp_path, "wb") as cache_file:
+                for idx, chunk in enumerate(iter_stream_chunks(source, blob_block_size)):
+                    block_id = base64.b64encode(f"{idx:08d}".encode()).decode()
+                    block_list.append(BlobBlock(block_id=block_id))
+                    cache_file.write(chunk)
+                    pending.add(executor.submit(blob_client.stage_block, block_id, chunk))
+
+                    # Limitar los bloques en vuelo para mantener acotada la memoria
+                    if len(pending) >= max_concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+
+            for future in pending:
+                future.result()
+
+        result = blob_client.commit_block_list(block_list)
+        blob_cache.commit(filename, result['etag'], temp_path)
+
+        blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{container_name}/{filename}"
+        return blob_url
+    except Exception as e:
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+        raise RuntimeError(f"Error al subir el archivo a Blob Storage: {str(e)}")
+
+def iter_stream_chunks(source: Union[BinaryIO, Iterable[bytes]], chunk_size: int) -> Iterator[bytes]:
+    """
+    Recorre un objeto tipo archivo o un iterador de bytes en fragmentos de `chunk_size` bytes.
+    """
+    if hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        return
+
+    buffer = bytearray()
+    for piece in source:
+        buffer.extend(piece)
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    if buffer:
+        yield bytes(buffer)
+
 def download_file_from_blob(blob_url: str) -> Path:
     """
     Descarga un archivo desde Blob Storage y lo guarda temporalmente en /tmp.
@@ -50,11 +134,8 @@ def download_file_from_blob(blob_url: str) -> Path:
         # Usar el container_name configurado en lugar de extraerlo de la URL
         blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
 
-        # Descargar el blob al directorio temporal
-        download_path = Path("/tmp") / blob_name
-        with open(download_path, "wb") as download_file:
-            download_file.write(blob_client.download_blob().readall())
-        return download_path
+        # Descargar el blob al directorio temporal (pasando por la caché local)
+        return fetch_blob_to_tmp(blob_client, blob_name, Path("/tmp") / blob_name)
     except Exception as e:
         raise RuntimeError(f"Error al descargar el archivo desde Blob Storage: {str(e)}")
     
@@ -81,14 +162,9 @@ def download_text_file_from_blob(blob_url: str) -> Path:
         
         # Descargar el contenido sin verificar existencia
         try:
-            blob_data = blob_client.download_blob()
-            
             # Usar el nombre original del archivo para la descarga local
             local_filename = Path(blob_name).name
-            download_path = Path("/tmp") / local_filename
-            
-            with open(download_path, "wb") as download_file:
-                download_file.write(blob_data.readall())
+            download_path = fetch_blob_to_tmp(blob_client, blob_name, Path("/tmp") / local_filename)
             
             print(f"Archivo descargado exitosamente a: {download_path}")
             return download_path
@@ -104,6 +180,80 @@ def download_text_file_from_blob(blob_url: str) -> Path:
         print(f"Error general: {str(e)}")
         raise RuntimeError(f"Error al procesar la descarga: {str(e)}")
 
+def fetch_blob_to_tmp(blob_client: BlobClient, blob_name: str, download_path: Path) -> Path:
+    """
+    Materializa un blob en `download_path` usando la caché local indexada por nombre + ETag.
+    Solo se descarga el contenido si la versión actual del blob no está en caché.
+    """
+    etag = blob_client.get_blob_properties().etag
+    cached_path = blob_cache.get(blob_name, etag, download_path)
+    if cached_path is not None:
+        return cached_path
+
+    temp_path = blob_cache.reserve(blob_name, etag)
+    try:
+        with open(temp_path, "wb") as cached_file:
+            downloader = blob_client.download_blob(
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified,
+                max_concurrency=blob_max_concurrency
+            )
+            downloader.readinto(cached_file)
+        # Enlazar el destino antes de registrar el archivo, que podría expulsarse enseguida
+        link_or_copy(temp_path, download_path)
+    except Exception:
+        temp_path.unlink(missing_ok=True)
+        raise
+    blob_cache.commit(blob_name, etag, temp_path)
+    return Path(download_path)
+
+def read_blob_bytes(blob_name: str) -> Optional[bytes]:
+    """
+    Lee en memoria un blob pequeño (p. ej. un índice JSON). Retorna None si no existe.
+    """
+    try:
+        return container_client.get_blob_client(blob_name).download_blob().readall()
+    except ResourceNotFoundError:
+        return None
+    except Exception as e:
+        raise RuntimeError(f"Error al descargar el archivo desde Blob Storage: {str(e)}")
+
+def get_blob_metadata(blob_url: str) -> dict:
+    """
+    Devuelve los metadatos definidos por el usuario de un blob.
+    """
+    try:
+        blob_name = urlparse(blob_url).path.split('/')[-1]
+        blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        return dict(blob_client.get_blob_properties().metadata or {})
+    except Exception as e:
+        raise RuntimeError(f"Error al leer los metadatos del blob: {str(e)}")
+
+def set_blob_metadata(blob_url: str, metadata: dict) -> None:
+    """
+    Añade o actualiza metadatos de un blob sin reescribir su contenido.
+    Como el ETag cambia, la entrada de la caché local se reasigna al nuevo ETag.
+    """
+    try:
+        blob_name = urlparse(blob_url).path.split('/')[-1]
+        blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        properties = blob_client.get_blob_properties()
+        merged = {**(properties.metadata or {}), **{key: str(value) for key, value in metadata.items()}}
+        result = blob_client.set_blob_metadata(
+            merged,
+            etag=properties.etag,
+            match_condition=MatchConditions.IfNotModified
+        )
+        blob_cache.rekey(blob_name, properties.etag, result['etag'])
+    except Exception as e:
+        raise RuntimeError(f"Error al actualizar los metadatos del blob: {str(e)}")
+
+def get_blob_cache_stats() -> dict:
+    """
+    Devuelve los contadores de aciertos, fallos y bytes ahorrados de la caché local de blobs.
+    """
+    return blob_cache.stats()
+
 def delete_file_from_blob(blob_url: str):
     """
     Elimina un archivo de Blob Storage usando su URL.
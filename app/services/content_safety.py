@@ -1,7 +1,12 @@
+import asyncio
+from collections import defaultdict
+from typing import Callable, Optional
 from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
-from azure.ai.contentsafety import ContentSafetyClient
+from azure.ai.contentsafety.aio import ContentSafetyClient
 from azure.ai.contentsafety.models import AnalyzeTextOptions, TextCategory
+from app.models.content_safety import ContentSafetyVerdict
 from app.utils.file_utils import print_styled_message, read_file
+from app.utils.text_utils import split_text
 from urllib.parse import unquote, urlparse
 from azure.storage.blob import BlobServiceClient
 import os
@@ -12,7 +17,23 @@ import os
 # blob_service_client = BlobServiceClient.from_connection_string(azure_blob_connection_string)
 # container_client = blob_service_client.get_container_client(container_name)
 
-def analyze_content_safety(client: ContentSafetyClient, text: str) -> dict:
+# Severidad a partir de la cual se rechaza el contenido y análisis simultáneos por video
+content_safety_block_severity = int(os.getenv('CONTENT_SAFETY_BLOCK_SEVERITY', '5'))
+content_safety_max_concurrency = int(os.getenv('CONTENT_SAFETY_MAX_CONCURRENCY', '4'))
+
+class ContentBlockedError(Exception):
+    """
+    El contenido superó el umbral de severidad; `verdict` contiene el detalle.
+    """
+
+    def __init__(self, verdict: ContentSafetyVerdict):
+        super().__init__(
+            f"El contenido no es aceptable: categoría {verdict.offending_category}, "
+            f"severidad {verdict.severities.get(verdict.offending_category)} en la parte {verdict.offending_part}"
+        )
+        self.verdict = verdict
+
+async def analyze_content_safety(client: ContentSafetyClient, text: str) -> dict:
     """
     Analiza el texto utilizando la API de Azure Content Safety.
     """
@@ -22,7 +43,7 @@ def analyze_content_safety(client: ContentSafetyClient, text: str) -> dict:
     )
 
     try:
-        response = client.analyze_text(request)
+        response = await client.analyze_text(request)
     except HttpResponseError as e:
         print_styled_message("Error al analizar el texto.")
         if e.error:
@@ -39,26 +60,126 @@ def analyze_content_safety(client: ContentSafetyClient, text: str) -> dict:
 
     return results
 
-def display_content_safety_results(results: dict) -> None:
+class IncrementalSafetyScanner:
+    """
+    Analiza el texto a medida que llega (por ejemplo, cada parte que devuelve Whisper) en lugar
+    de esperar a la transcripción completa.
+
+    Los análisis se ejecutan en paralelo con un máximo de `max_concurrency` llamadas. En cuanto
+    una parte alcanza `block_severity` (o un análisis falla) se cancelan los análisis pendientes
+    y se llama a `on_stop`, para que quien produce el texto deje de hacerlo.
+    """
+
+    def __init__(self, client: ContentSafetyClient, max_concurrency: Optional[int] = None,
+                 block_severity: Optional[int] = None, on_stop: Optional[Callable[[], None]] = None):
+        self.client = client
+        self.block_severity = content_safety_block_severity if block_severity is None else block_severity
+        self.on_stop = on_stop
+        self._semaphore = asyncio.Semaphore(max_concurrency or content_safety_max_concurrency)
+        self._tasks = set()
+        self._severities = defaultdict(int)
+        self._offending = None  # (índice de la parte, categoría)
+        self.error = None
+        self.parts_total = 0
+        self.parts_scanned = 0
+
+    @property
+    def blocked(self) -> bool:
+        return self._offending is not None
+
+    @property
+    def stopped(self) -> bool:
+        return self.blocked or self.error is not None
+
+    def submit(self, idx: int, text: str) -> None:
+        """
+        Programa el análisis del texto de la parte `idx` (en trozos que admite el servicio).
+        """
+        if self.stopped:
+            return
+        for piece in split_text(text, 5120):
+            self.parts_total += 1
+            task = asyncio.create_task(self._scan(idx, piece))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _scan(self, idx: int, text: str) -> None:
+        try:
+            async with self._semaphore:
+                results = await analyze_content_safety(self.client, text)
+        except Exception as e:
+            if not self.stopped:
+                self.error = e
+                self._stop()
+            return
+
+        self.parts_scanned += 1
+        for category, analysis in results.items():
+            # Una severidad 0 también se registra y se compara: con `block_severity=0` bloquea
+            if analysis is not None and analysis.severity is not None:
+                self._severities[category] = max(self._severities[category], analysis.severity)
+                if analysis.severity >= self.block_severity and not self.stopped:
+                    self._offending = (idx, category)
+                    self._stop()
+
+    def _stop(self) -> None:
+        current = asyncio.current_task()
+        for task in list(self._tasks):
+            if task is not current:
+                task.cancel()
+        if self.on_stop:
+            self.on_stop()
+
+    def verdict(self) -> ContentSafetyVerdict:
+        offending_part, offending_category = self._offending or (None, None)
+        return ContentSafetyVerdict(
+            blocked=self.blocked,
+            severities=dict(self._severities),
+            block_severity=self.block_severity,
+            offending_part=offending_part,
+            offending_category=offending_category,
+            parts_total=self.parts_total,
+            parts_scanned=self.parts_scanned
+        )
+
+    async def finish(self) -> ContentSafetyVerdict:
+        """
+        Espera a los análisis pendientes y retorna el veredicto consolidado. Si un análisis
+        falló, relanza su error.
+        """
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.error is not None and not self.blocked:
+            raise self.error
+        return self.verdict()
+
+async def scan_content_safety(client: ContentSafetyClient, text_parts: list[str], max_concurrency: Optional[int] = None,
+                              block_severity: Optional[int] = None) -> ContentSafetyVerdict:
+    """
+    Analiza todas las partes en paralelo (con un máximo de `max_concurrency` llamadas simultáneas)
+    y retorna el veredicto consolidado. En cuanto una parte alcanza `block_severity` se cancelan
+    los análisis pendientes.
+    """
+    scanner = IncrementalSafetyScanner(client, max_concurrency, block_severity)
+    for idx, part in enumerate(text_parts):
+        scanner.submit(idx, part)
+    return await scanner.finish()
+
+def display_content_safety_results(results: dict, block_severity: Optional[int] = None) -> None:
     """
     Muestra un resumen consolidado de los resultados del análisis de contenido.
+    `results` contiene la severidad máxima de cada categoría.
     """
+    block_severity = content_safety_block_severity if block_severity is None else block_severity
     print_styled_message("Analizando contenido del archivo:")
     contenido_seguro = True
 
-    for category, result in results.items():
-        if result:
-            severity = result.severity
-            if severity >= 5:
-                print_styled_message(f"Categoría: {category}, Severidad: {severity}")
-                print_styled_message("El contenido no es aceptable. El script se detendrá.")
-                exit(1)
-            elif severity >= 4:
-                print_styled_message(f"Categoría: {category}, Severidad: {severity}")
-            elif severity >= 2:
-                print_styled_message(f"Categoría: {category}, Severidad: {severity}")
-            if severity >= 5:
-                contenido_seguro = False
+    for category, severity in results.items():
+        if severity >= 2:
+            print_styled_message(f"Categoría: {category}, Severidad: {severity}")
+        if severity >= block_severity:
+            print_styled_message("El contenido no es aceptable. Se detiene el proceso.")
+            contenido_seguro = False
 
     if contenido_seguro:
-        print_styled_message("El contenido es seguro y confiable.")
\ No newline at end of file
+        print_styled_message("El contenido es seguro y confiable.")
@@ -1,17 +1,52 @@
-from openai import AzureOpenAI
+import asyncio
+import os
+import time
+from typing import Optional
+from openai import AsyncAzureOpenAI, RateLimitError
 from app.utils.file_utils import print_styled_message
 from app.utils.text_utils import split_text_gpt
+from app.utils.tokenizer import count_tokens, load_encoding, tokenizer_encoding_name
+from app.services.scheduler import run_blocking
+from app.utils.concurrency import AsyncRateLimiter
 
-def improve_transcription(text: str, ai_client: AzureOpenAI, language: str = None) -> str:
+# Fragmentos que se mejoran a la vez y reintentos cuando Azure OpenAI responde 429
+improvement_max_concurrency = int(os.getenv('IMPROVEMENT_MAX_CONCURRENCY', '4'))
+improvement_max_retries = int(os.getenv('IMPROVEMENT_MAX_RETRIES', '5'))
+improvement_retry_backoff = float(os.getenv('IMPROVEMENT_RETRY_BACKOFF_SECONDS', '2'))
+# Tamaño del contexto de gpt-35-turbo-instruct, tokens de margen y proporción esperada entre la
+# respuesta y el fragmento
+gpt_context_tokens = int(os.getenv('GPT_CONTEXT_TOKENS', '4096'))
+gpt_context_margin_tokens = int(os.getenv('GPT_CONTEXT_MARGIN_TOKENS', '64'))
+improvement_output_ratio = float(os.getenv('IMPROVEMENT_OUTPUT_RATIO', '1.1'))
+# Tokens por segundo que admite el despliegue (0 para no limitar); cada llamada reserva el contexto completo
+improvement_rate_limiter = AsyncRateLimiter(rate_per_second=float(os.getenv('IMPROVEMENT_TOKENS_PER_SECOND', '0')))
+# Tiempo máximo que se espera al vocabulario del tokenizador al arrancar
+tokenizer_load_timeout = float(os.getenv('GPT_TOKENIZER_LOAD_TIMEOUT', '20'))
+
+async def preload_tokenizer(timeout: float = None) -> None:
+    """
+    Carga el vocabulario al arrancar la aplicación en un hilo y con límite de tiempo, para que
+    ninguna petición lo descargue en el bucle de eventos. Si no termina a tiempo, se sigue
+    cargando en segundo plano y mientras tanto los tokens se estiman.
+    """
+    timeout = tokenizer_load_timeout if timeout is None else timeout
+    try:
+        await asyncio.wait_for(asyncio.shield(run_blocking(load_encoding)), timeout)
+    except asyncio.TimeoutError:
+        print_styled_message(f"El vocabulario {tokenizer_encoding_name} no se cargó en {timeout}s: los tokens se estimarán mientras tanto")
+
+async def improve_transcription(text: str, ai_client: AsyncAzureOpenAI, language: str = None,
+                                stats: Optional[dict] = None) -> str:
     """
     Mejora el texto completo utilizando el modelo GPT-3.5-turbo-instruct de Azure OpenAI.
+
+    Los fragmentos se mejoran en paralelo (hasta `improvement_max_concurrency` a la vez) y se
+    unen en su orden original. Si se indica `stats`, se guardan en él la latencia y los tokens
+    de cada fragmento y los totales.
     """
     if not text:
         raise ValueError("El texto de entrada está vacío")
 
-    max_tokens = 1000  # Límite de tokens por fragmento
-    text_chunks = split_text_gpt(text, max_tokens)
-
     # Definir el prompt según el idioma
     if language == 'es':
         prompt = (
@@ -46,15 +81,63 @@ def improve_transcription(text: str, ai_client: AzureOpenAI, language: str = Non
             "Improve the following text:\n\n"
         )
 
-    improved_texts = []
+    # Presupuesto de tokens: el contexto del modelo, menos el prompt, se reparte entre el
+    # fragmento y su respuesta (que ocupa aproximadamente lo mismo que el fragmento)
+    available_tokens = gpt_context_tokens - count_tokens(prompt) - gpt_context_margin_tokens
+    chunk_tokens = int(available_tokens / (1 + improvement_output_ratio))
+    text_chunks = split_text_gpt(text, chunk_tokens)
+
+    semaphore = asyncio.Semaphore(improvement_max_concurrency)
+    chunk_stats = [None] * len(text_chunks)
+
+    async def improve_chunk(idx: int, chunk: str) -> str:
+        # La respuesta puede usar todo el contexto que no ocupan el prompt y el fragmento
+        max_tokens = available_tokens - count_tokens(chunk)
+        async with semaphore:
+            await improvement_rate_limiter.acquire(gpt_context_tokens - gpt_context_margin_tokens)
+            improved_text, chunk_stats[idx] = await _complete_with_retries(ai_client, f"{prompt}{chunk}", max_tokens)
+        print_styled_message(
+            f"Fragmento {idx + 1}/{len(text_chunks)} mejorado en {chunk_stats[idx]['latency_s']:.1f}s "
+            f"({chunk_stats[idx]['prompt_tokens']} + {chunk_stats[idx]['completion_tokens']} tokens)."
+        )
+        return improved_text
+
+    print_styled_message(f"Mejorando la transcripción ({len(text_chunks)} fragmentos, hasta {improvement_max_concurrency} en paralelo)...")
+    start = time.perf_counter()
+
+    tasks = [asyncio.create_task(improve_chunk(idx, chunk)) for idx, chunk in enumerate(text_chunks)]
+    try:
+        # gather conserva el orden de los fragmentos aunque terminen en otro orden
+        improved_texts = await asyncio.gather(*tasks)
+    except BaseException as e:
+        for task in tasks:
+            task.cancel()
+        print_styled_message(f"Error al mejorar el texto: {str(e)}")
+        raise
+
+    elapsed = time.perf_counter() - start
+    if stats is not None:
+        stats["chunks"] = chunk_stats
+        stats["elapsed_s"] = round(elapsed, 3)
+        stats["prompt_tokens"] = sum(chunk["prompt_tokens"] for chunk in chunk_stats)
+        stats["completion_tokens"] = sum(chunk["completion_tokens"] for chunk in chunk_stats)
+        stats["retries"] = sum(chunk["retries"] for chunk in chunk_stats)
 
-    print_styled_message("Mejorando la transcripción...")
+    print_styled_message(f"Mejora de transcripción completada en {elapsed:.1f}s.")
 
-    for idx, chunk in enumerate(text_chunks, 1):
+    return ' '.join(improved_texts)
+
+async def _complete_with_retries(ai_client: AsyncAzureOpenAI, prompt: str, max_tokens: int) -> tuple[str, dict]:
+    """
+    Mejora un fragmento, esperando y reintentando si el servicio limita la frecuencia (429).
+    Retorna el texto mejorado y la latencia y los tokens consumidos.
+    """
+    for attempt in range(improvement_max_retries + 1):
+        start = time.perf_counter()
         try:
-            response = ai_client.completions.create(
+            response = await ai_client.completions.create(
                 model="gpt-35-turbo-instruct",
-                prompt=f"{prompt}{chunk}",
+                prompt=prompt,
                 temperature=0,
                 max_tokens=max_tokens,
                 top_p=0.9,  # Ajuste del parámetro top_p para mejorar la coherencia
@@ -62,13 +145,19 @@ def improve_transcription(text: str, ai_client: AzureOpenAI, language: str = Non
                 presence_penalty=0,
                 stop=None
             )
-            improved_text = response.choices[0].text.strip()
-            improved_texts.append(improved_text)
-            print_styled_message(f"Fragmento {idx}/{len(text_chunks)} mejorado.")
-        except Exception as e:
-            print_styled_message(f"Error al mejorar el texto: {str(e)}")
-            raise
-
-    print_styled_message("Mejora de transcripción completada.")
+        except RateLimitError as e:
+            if attempt >= improvement_max_retries:
+                raise
+            retry_after = e.response.headers.get('retry-after') if e.response is not None else None
+            delay = float(retry_after) if retry_after else improvement_retry_backoff * (2 ** attempt)
+            print_styled_message(f"Límite de frecuencia de GPT alcanzado. Reintentando en {delay:.1f}s...")
+            await asyncio.sleep(delay)
+            continue
 
-    return ' '.join(improved_texts)
\ No newline at end of file
+        usage = response.usage
+        return response.choices[0].text.strip(), {
+            "latency_s": round(time.perf_counter() - start, 3),
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "retries": attempt,
+        }
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+from app.models.job import Job
+from app.services.pipeline import get_or_process_video
+from app.services.content_safety import ContentBlockedError
+from app.services.scheduler import pipeline_scheduler, run_blocking
+from app.utils.file_utils import print_styled_message
+
+# Los trabajos en ejecución se renuevan cada `job_heartbeat_seconds`; si un trabajo lleva más de
+# `job_stale_seconds` sin renovarse, su proceso se da por perdido y el trabajo vuelve a la cola
+job_heartbeat_seconds = float(os.getenv('JOB_HEARTBEAT_SECONDS', '15'))
+job_stale_seconds = float(os.getenv('JOB_STALE_SECONDS', '60'))
+
+JOB_COLUMNS = ("id", "url", "video_id", "title", "batch_id", "status", "stage", "result", "error", "created_at", "updated_at")
+
+class JobStore:
+    """
+    Estado persistente de los trabajos en SQLite, para que sobrevivan a reinicios del proceso.
+    Cada trabajo en ejecución lleva el identificador del proceso que lo reclamó (`owner`).
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    video_id TEXT,
+                    title TEXT,
+                    batch_id TEXT,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_batch_id ON jobs (batch_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Job:
+        values = {column: row[column] for column in JOB_COLUMNS}
+        values["result"] = json.loads(row["result"]) if row["result"] else None
+        return Job(**values)
+
+    def create(self, url: str, video_id: Optional[str] = None, title: Optional[str] = None,
+               batch_id: Optional[str] = None) -> Job:
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, url=url, video_id=video_id, title=title, batch_id=batch_id,
+                  created_at=now, updated_at=now)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, url, video_id, title, batch_id, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.url, job.video_id, job.title, job.batch_id, job.status, now, now)
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def list_by_batch(self, batch_id: str) -> list[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE batch_id = ? ORDER BY created_at, rowid", (batch_id,)
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def list_ids(self, status: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at, rowid", (status,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """
+        Marca un trabajo en cola como en ejecución por `owner`. Retorna False si otro proceso ya lo reclamó.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, updated_at = ? WHERE id = ? AND status = 'queued'",
+                (owner, time.time(), job_id)
+            )
+        return cursor.rowcount == 1
+
+    def update(self, job_id: str, **fields) -> None:
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def heartbeat(self, owner: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE owner = ? AND status = 'running'",
+                (time.time(), owner)
+            )
+
+    def requeue_stale(self, stale_seconds: float) -> list[str]:
+        """
+        Devuelve a la cola los trabajos en ejecución cuyo proceso dejó de renovarlos.
+        """
+        limit = time.time() - stale_seconds
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND updated_at < ?", (limit,)
+            ).fetchall()
+            job_ids = [row["id"] for row in rows]
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'queued', owner = NULL WHERE id = ? AND status = 'running'",
+                [(job_id,) for job_id in job_ids]
+            )
+        return job_ids
+
+job_store = JobStore(os.getenv('JOB_DB_PATH', '/tmp/jobs.db'))
+
+# Identificador de este proceso como propietario de los trabajos que ejecuta
+worker_id = uuid.uuid4().hex
+
+async def submit_job(url: str, video_id: Optional[str] = None, title: Optional[str] = None,
+                     batch_id: Optional[str] = None) -> Job:
+    """
+    Registra un trabajo para un video y lo programa en la capacidad de trabajo compartida.
+    """
+    job = await run_blocking(job_store.create, url, video_id=video_id, title=title, batch_id=batch_id)
+    pipeline_scheduler.spawn(run_job, job.id)
+    return job
+
+def get_job(job_id: str) -> Optional[Job]:
+    return job_store.get(job_id)
+
+async def run_job(job_id: str) -> None:
+    """
+    Ejecuta un trabajo en cola, registrando la etapa en curso y el resultado o el error.
+    """
+    if not await run_blocking(job_store.claim, job_id, worker_id):
+        return
+    job = await run_blocking(job_store.get, job_id)
+    print_styled_message(f"Iniciando el trabajo {job_id} para {job.url}")
+
+    async def progress(stage: str) -> None:
+        await run_blocking(job_store.update, job_id, stage=stage)
+
+    try:
+        result = await get_or_process_video(job.url, progress=progress)
+        await run_blocking(job_store.update, job_id, status="completed", stage=None,
+                           video_id=result.get("video_id"), result=result)
+        print_styled_message(f"Trabajo {job_id} completado")
+    except ContentBlockedError as e:
+        print_styled_message(f"Trabajo {job_id} bloqueado por el análisis de seguridad")
+        await run_blocking(job_store.update, job_id, status="blocked", error=str(e),
+                           result={"content_safety": e.verdict.model_dump()})
+    except Exception as e:
+        print_styled_message(f"Error en el trabajo {job_id}: {str(e)}")
+        await run_blocking(job_store.update, job_id, status="failed", error=str(e))
+
+def resume_jobs() -> asyncio.Task:
+    """
+    Vuelve a programar los trabajos pendientes tras un reinicio y arranca la renovación periódica
+    de los trabajos de este proceso. Debe llamarse desde el bucle de eventos; retorna la tarea
+    de renovación, que se cancela al detener la aplicación.
+    """
+    job_store.requeue_stale(job_stale_seconds)
+    job_ids = job_store.list_ids("queued")
+    for job_id in job_ids:
+        pipeline_scheduler.spawn(run_job, job_id)
+    if job_ids:
+        print_styled_message(f"Reanudando {len(job_ids)} trabajos pendientes")
+
+    return asyncio.create_task(_maintain_jobs())
+
+async def _maintain_jobs() -> None:
+    while True:
+        await asyncio.sleep(job_heartbeat_seconds)
+        try:
+            await run_blocking(job_store.heartbeat, worker_id)
+            for job_id in await run_blocking(job_store.requeue_stale, job_stale_seconds):
+                print_styled_message(f"Reanudando el trabajo abandonado {job_id}")
+                pipeline_scheduler.spawn(run_job, job_id)
+        except Exception as e:
+            print_styled_message(f"Error al renovar los trabajos: {str(e)}")
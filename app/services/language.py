@@ -0,0 +1,172 @@
+import math
+import os
+from collections import Counter
+from typing import Optional
+from azure.ai.textanalytics.aio import TextAnalyticsClient
+from app.models.language import LanguageDetection
+from app.utils.file_utils import print_styled_message
+from app.utils.language_id import identify_language
+
+# Límites de Text Analytics para detect_language: documentos por petición, caracteres por
+# documento y tamaño total de la petición (se deja margen para el JSON)
+language_batch_size = int(os.getenv('LANGUAGE_DETECTION_BATCH_SIZE', '1000'))
+language_max_document_chars = int(os.getenv('LANGUAGE_DETECTION_MAX_DOCUMENT_CHARS', '5120'))
+language_max_request_bytes = int(os.getenv('LANGUAGE_DETECTION_MAX_REQUEST_BYTES', '900000'))
+# Partes que se analizan como máximo en transcripciones largas, y tamaño de la primera muestra
+language_sample_size = int(os.getenv('LANGUAGE_DETECTION_SAMPLE_SIZE', '30'))
+language_probe_size = int(os.getenv('LANGUAGE_DETECTION_PROBE_SIZE', '5'))
+# Valor z del intervalo de Wilson usado para decidir que la mayoría ya no puede cambiar
+language_confidence_z = float(os.getenv('LANGUAGE_DETECTION_CONFIDENCE_Z', '1.96'))
+# Identificación local por palabras vacías antes de recurrir a Text Analytics
+local_language_id = os.getenv('LOCAL_LANGUAGE_ID', 'true').lower() == 'true'
+local_language_min_tokens = int(os.getenv('LOCAL_LANGUAGE_ID_MIN_TOKENS', '30'))
+local_language_min_coverage = float(os.getenv('LOCAL_LANGUAGE_ID_MIN_COVERAGE', '0.2'))
+local_language_min_margin = float(os.getenv('LOCAL_LANGUAGE_ID_MIN_MARGIN', '2.0'))
+
+# Contadores del proceso: partes resueltas localmente o por Text Analytics, y detecciones
+# completas que no necesitaron ninguna llamada
+language_stats = Counter()
+
+def sample_parts(text_parts: list[str], sample_size: int) -> list[str]:
+    """
+    Elige hasta `sample_size` partes repartidas uniformemente por todo el texto.
+    """
+    if len(text_parts) <= sample_size:
+        return list(text_parts)
+    step = len(text_parts) / sample_size
+    return [text_parts[int(i * step)] for i in range(sample_size)]
+
+def pack_documents(texts: list[str], batch_size: int = None, max_request_bytes: int = None) -> list[list[dict]]:
+    """
+    Agrupa los textos en el menor número de peticiones que permiten los límites del servicio.
+    """
+    batch_size = batch_size or language_batch_size
+    max_request_bytes = max_request_bytes or language_max_request_bytes
+    batches = []
+    batch, batch_bytes = [], 0
+    for text in texts:
+        document = {"id": str(len(batch)), "text": text[:language_max_document_chars]}
+        document_bytes = len(document["text"].encode('utf-8'))
+        if batch and (len(batch) >= batch_size or batch_bytes + document_bytes > max_request_bytes):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+            document["id"] = "0"
+        batch.append(document)
+        batch_bytes += document_bytes
+    if batch:
+        batches.append(batch)
+    return batches
+
+def majority_settled(counts: Counter, remaining: int, z: float = None) -> bool:
+    """
+    Indica si el idioma más frecuente ya es mayoría con seguridad: o bien las partes restantes
+    no pueden cambiar el resultado, o bien el límite inferior del intervalo de Wilson de su
+    proporción supera el 50 %.
+    """
+    z = language_confidence_z if z is None else z
+    if not counts:
+        return False
+    (_, leader), *rest = counts.most_common(2) + [(None, 0)]
+    runner_up = rest[0][1]
+    if leader > runner_up + remaining:
+        return True
+
+    n = sum(counts.values())
+    p = leader / n
+    center = p + z * z / (2 * n)
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    return (center - margin) / (1 + z * z / n) > 0.5
+
+async def detect_predominant_language(client: TextAnalyticsClient, text_parts: list[str],
+                                      sample_size: Optional[int] = None) -> LanguageDetection:
+    """
+    Detecta el idioma predominante enviando varias partes por llamada a Text Analytics.
+
+    En transcripciones largas solo se analiza una muestra repartida por todo el texto. Primero
+    se analiza una muestra pequeña y, si la mayoría ya está decidida, no se analiza el resto.
+    Las partes que el identificador local clasifica con confianza no se envían a Azure.
+    """
+    if not text_parts:
+        raise ValueError("No hay texto para detectar el idioma")
+
+    sample = sample_parts(text_parts, sample_size or language_sample_size)
+    # La primera muestra también se reparte por todo el texto, no solo por su comienzo
+    probe_indexes = set(sample_parts(list(range(len(sample))), language_probe_size))
+    probe = [part for idx, part in enumerate(sample) if idx in probe_indexes]
+    rest = [part for idx, part in enumerate(sample) if idx not in probe_indexes]
+
+    counts = Counter()
+    requests = 0
+    analyzed = 0
+    local_parts = 0
+    early_stop = False
+    for round_parts in (probe, rest):
+        if not round_parts:
+            continue
+        if majority_settled(counts, len(round_parts)):
+            early_stop = True
+            break
+        remote_parts = []
+        for part in round_parts:
+            language = _identify_locally(part)
+            if language:
+                counts[language] += 1
+                local_parts += 1
+            else:
+                remote_parts.append(part)
+        analyzed += len(round_parts) - len(remote_parts)
+
+        for documents in pack_documents(remote_parts):
+            results = await client.detect_language(documents=documents)
+            requests += 1
+            for result in results:
+                if result.is_error:
+                    print_styled_message(f"Error al detectar el idioma de una parte: {result.error.message}")
+                    continue
+                counts[result.primary_language.iso6391_name] += 1
+            analyzed += len(documents)
+
+    if not counts:
+        raise RuntimeError("No se pudo detectar el idioma de ninguna parte del texto")
+
+    detection = LanguageDetection(
+        language=counts.most_common(1)[0][0],
+        counts=dict(counts),
+        parts_total=len(text_parts),
+        parts_analyzed=analyzed,
+        parts_local=local_parts,
+        requests=requests,
+        early_stop=early_stop
+    )
+    language_stats["parts_local"] += local_parts
+    language_stats["parts_remote"] += analyzed - local_parts
+    language_stats["requests"] += requests
+    language_stats["detections"] += 1
+    language_stats["detections_local_only"] += int(requests == 0)
+    print_styled_message(
+        f"Idioma detectado: {detection.language} ({analyzed}/{len(text_parts)} partes, "
+        f"{local_parts} locales, {requests} {'llamada' if requests == 1 else 'llamadas'})"
+    )
+    return detection
+
+def _identify_locally(text: str) -> Optional[str]:
+    if not local_language_id:
+        return None
+    language, _ = identify_language(
+        text,
+        min_tokens=local_language_min_tokens,
+        min_coverage=local_language_min_coverage,
+        min_margin=local_language_min_margin
+    )
+    return language
+
+def get_language_detection_stats() -> dict:
+    """
+    Devuelve cuántas partes y detecciones se resolvieron con el identificador local.
+    """
+    stats = dict(language_stats)
+    parts = stats.get("parts_local", 0) + stats.get("parts_remote", 0)
+    detections = stats.get("detections", 0)
+    stats["local_part_ratio"] = stats.get("parts_local", 0) / parts if parts else 0.0
+    stats["local_only_ratio"] = stats.get("detections_local_only", 0) / detections if detections else 0.0
+    return stats
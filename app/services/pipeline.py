@@ -0,0 +1,200 @@
+import functools
+import os
+from collections import Counter
+from typing import Awaitable, Callable, Optional
+from app.services.youtube import download_youtube_audio, get_video_metadata, extract_video_id, get_caption_transcript
+from app.services.azure_clients import azure_client_registry
+from app.services.transcription import transcribe_audio, save_transcription
+from app.services.content_safety import IncrementalSafetyScanner, display_content_safety_results, ContentBlockedError
+from app.services.translation import translate_parts
+from app.services.language import detect_predominant_language
+from app.services.improvement import improve_transcription
+from app.services.result_store import get_stored_result, save_result
+from app.services.blob_storage_service import upload_file_to_blob
+from app.models.blob_storage import FileUploadRequest
+from app.utils.file_utils import print_styled_message
+from app.utils.text_utils import split_text
+from app.services.scheduler import pipeline_scheduler, run_blocking, run_network
+from app.utils.concurrency import AsyncSingleFlight
+
+# Idiomas a los que se traducen los textos en inglés; el primero es el que se mejora con GPT.
+# Si la variable está vacía se traduce al español, como antes de que fuera configurable
+translation_target_languages = [
+    language.strip() for language in os.getenv('TRANSLATION_TARGET_LANGUAGES', 'es').split(',') if language.strip()
+] or ['es']
+
+# Un único procesamiento en curso por video: las peticiones repetidas esperan al mismo resultado
+video_flights = AsyncSingleFlight()
+
+# Recibe el nombre de la etapa en curso del proceso (para informar el progreso de un trabajo)
+ProgressCallback = Callable[[str], Awaitable[None]]
+
+# Por video en curso: quienes esperan su resultado y la última etapa notificada
+video_listeners: dict[str, set] = {}
+video_stages: dict[str, str] = {}
+
+async def get_or_process_video(url: str, progress: Optional[ProgressCallback] = None) -> dict:
+    """
+    Devuelve el resultado de un video a partir de su ID: si ya se procesó se sirve desde el
+    índice de resultados y, si se está procesando, se espera a ese mismo procesamiento.
+    """
+    video_id = extract_video_id(url) or (await run_network(get_video_metadata, url)).id
+
+    stored = await run_blocking(get_stored_result, video_id)
+    if stored is not None:
+        print_styled_message(f"Resultado del video {video_id} servido desde el índice de resultados")
+        return {**stored, "cached": True}
+
+    # Todas las peticiones unidas al mismo video reciben las etapas del procesamiento compartido
+    listeners = video_listeners.setdefault(video_id, set())
+    if progress is not None:
+        listeners.add(progress)
+        if video_id in video_stages:
+            await progress(video_stages[video_id])
+    try:
+        result, shared = await video_flights.do(video_id, _process_and_store, video_id, url)
+    finally:
+        listeners.discard(progress)
+        if not listeners and video_listeners.get(video_id) is listeners:
+            del video_listeners[video_id]
+    if shared:
+        print_styled_message(f"Petición unida al procesamiento en curso del video {video_id}")
+    return {**result, "cached": shared}
+
+async def _process_and_store(video_id: str, url: str) -> dict:
+    """
+    Trabajo compartido de un video: toma la capacidad de trabajo dentro de la propia tarea
+    compartida, de modo que cancelar a quien lo inició no deja un proceso fuera del límite.
+    """
+    # Otra instancia pudo terminar el mismo video mientras esta petición esperaba
+    stored = await run_blocking(get_stored_result, video_id)
+    if stored is not None:
+        return stored
+
+    try:
+        result = await pipeline_scheduler.run(process_youtube_video, url, functools.partial(_report_stage, video_id))
+    finally:
+        video_stages.pop(video_id, None)
+    await run_network(save_result, video_id, result)
+    return result
+
+async def _report_stage(video_id: str, stage: str) -> None:
+    video_stages[video_id] = stage
+    for listener in list(video_listeners.get(video_id, ())):
+        try:
+            await listener(stage)
+        except Exception as e:
+            print_styled_message(f"Error al notificar la etapa {stage} del video {video_id}: {str(e)}")
+
+async def process_youtube_video(url: str, progress: Optional[ProgressCallback] = None) -> dict:
+    """
+    Ejecuta el proceso completo para un video: descarga, transcripción, análisis de seguridad,
+    detección de idioma, traducción y mejora del texto. Si se indica `progress` (una
+    corrutina), se espera su notificación al inicio de cada etapa.
+
+    Las llamadas a los servicios de Azure son asíncronas; yt-dlp, Blob Storage y el
+    procesamiento de audio se ejecutan en hilos para no bloquear el bucle de eventos.
+    """
+    async def report(stage: str) -> None:
+        if progress is not None:
+            await progress(stage)
+
+    # Clientes de Azure compartidos por toda la aplicación (conexiones ya abiertas)
+    clients = await azure_client_registry.get()
+
+    await report("metadata")
+    # Extraer los metadatos del video una sola vez y reutilizarlos en todo el proceso
+    metadata = await run_network(get_video_metadata, url)
+
+    # El análisis de seguridad empieza con las primeras partes transcritas, sin esperar al texto completo
+    safety_scanner = IncrementalSafetyScanner(clients['content_safety'])
+
+    # Usar los subtítulos del video si la política lo permite; si no, transcribir el audio
+    await report("transcription")
+    caption_text, transcription_source = await run_network(get_caption_transcript, metadata)
+    if caption_text:
+        text = caption_text
+    else:
+        # Descargar y procesar el audio
+        original_file_url = await run_network(download_youtube_audio, metadata)
+
+        # Transcribir el audio (el recorte del silencio inicial se hace en memoria)
+        text = await transcribe_audio(original_file_url, clients['whisper'], trim=True, safety_scanner=safety_scanner)
+        transcription_source = "whisper"
+
+    # Los archivos se nombran por el ID del video: dos videos con el mismo título pueden procesarse a la vez
+    transcription_name = f"{metadata.id}.txt"
+    await run_network(save_transcription, text, metadata.id)
+
+    # Imprimir mensaje de iniciar análisis de seguridad
+    await report("content_safety")
+    print_styled_message('\nIniciando análisis de seguridad...')
+    # Análisis de seguridad del contenido (en paralelo; se detiene en la primera parte inaceptable).
+    # Las partes de Whisper ya se enviaron durante la transcripción; los subtítulos se analizan ahora
+    text_parts = split_text(text, 5120)
+    if caption_text:
+        for idx, part in enumerate(text_parts):
+            safety_scanner.submit(idx, part)
+    verdict = await safety_scanner.finish()
+    display_content_safety_results(verdict.severities)
+    if verdict.blocked:
+        raise ContentBlockedError(verdict)
+
+    # Detección de idioma
+    await report("language_detection")
+    detection = await detect_predominant_language(clients['ai'], text_parts)
+    predominant_language = detection.language
+
+    # Traducción si es necesario
+    translation_urls = {}
+    translation_memory_stats = Counter()
+    if predominant_language == 'en':
+        print_styled_message("El texto está en inglés. Se procederá a traducirlo al español.")
+        await report("translation")
+        # Todos los idiomas de destino se traducen en una sola pasada
+        translations = await translate_parts(
+            text_parts, clients, translation_target_languages, source_language='en', memory_stats=translation_memory_stats
+        )
+        for idx, (language, translated_parts) in enumerate(translations.items()):
+            translated_text = ' '.join(translated_parts)
+            if idx == 0:
+                text_to_improve = translated_text
+                language_to_improve = language
+            # Subir el texto traducido a Blob Storage (el idioma principal conserva el nombre de siempre)
+            prefix = "translated_" if idx == 0 else f"translated_{language}_"
+            translated_request = FileUploadRequest(
+                filename=f"{prefix}{transcription_name}",
+                file_data=translated_text.encode('utf-8')
+            )
+            translation_urls[language] = await run_network(upload_file_to_blob, translated_request)
+            print_styled_message(f"Texto traducido ({language}) guardado en Blob Storage: {translation_urls[language]}")
+    else:
+        print_styled_message("El texto está en español. No es necesaria la traducción.")
+        text_to_improve = text
+        language_to_improve = predominant_language
+
+    # Mejorar el texto
+    await report("improvement")
+    print_styled_message("Mejorando el texto...")
+    improvement_stats = {}
+    improved_text = await improve_transcription(text_to_improve, clients['gpt'], language=language_to_improve,
+                                                stats=improvement_stats)
+
+    # Subir el texto mejorado a Blob Storage
+    improved_request = FileUploadRequest(
+        filename=f"improved_{transcription_name}",
+        file_data=improved_text.encode('utf-8')
+    )
+    improved_url = await run_network(upload_file_to_blob, improved_request)
+    print_styled_message(f"Texto mejorado guardado en Blob Storage: {improved_url}")
+
+    return {
+        "message": "Transcripción completada y mejorada",
+        "video_id": metadata.id,
+        "transcription_source": transcription_source,
+        "transcription": improved_text,
+        "blob_url": improved_url,
+        "translations": translation_urls,
+        "translation_memory": dict(translation_memory_stats),
+        "improvement": improvement_stats
+    }
@@ -0,0 +1,43 @@
+import json
+import os
+from typing import Optional
+from app.services.blob_storage_service import read_blob_bytes, upload_file_to_blob
+from app.models.blob_storage import FileUploadRequest
+from app.utils.cache import TTLCache
+
+# Los resultados terminados se guardan en Blob Storage como result_<id>.json, de modo que
+# sirven a todas las instancias y sobreviven a reinicios; en memoria se guarda una copia local
+local_results = TTLCache(
+    maxsize=int(os.getenv('RESULT_CACHE_SIZE', '512')),
+    ttl=float(os.getenv('RESULT_CACHE_TTL_SECONDS', '3600'))
+)
+
+def _result_blob_name(video_id: str) -> str:
+    return f"result_{video_id}.json"
+
+def get_stored_result(video_id: str) -> Optional[dict]:
+    """
+    Devuelve el resultado ya calculado para un video, o None si no existe.
+    """
+    result = local_results.get(video_id)
+    if result is not None:
+        return result
+
+    data = read_blob_bytes(_result_blob_name(video_id))
+    if data is None:
+        return None
+
+    result = json.loads(data.decode('utf-8'))
+    local_results.set(video_id, result)
+    return result
+
+def save_result(video_id: str, result: dict) -> str:
+    """
+    Guarda el resultado de un video en el índice persistente y retorna la URL del blob.
+    """
+    local_results.set(video_id, result)
+    file_request = FileUploadRequest(
+        filename=_result_blob_name(video_id),
+        file_data=json.dumps(result, ensure_ascii=False).encode('utf-8')
+    )
+    return upload_file_to_blob(file_request)
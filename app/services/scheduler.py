@@ -0,0 +1,101 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+
+class PipelineScheduler:
+    """
+    Capacidad de trabajo compartida por todas las peticiones: limita cuántos videos se
+    procesan a la vez en el proceso, vengan de una petición individual, de un trabajo o de un lote.
+
+    La capacidad la toma solo el procesamiento real de un video (`run`); las tareas que únicamente
+    esperan (trabajos en cola, peticiones unidas a un video en curso) se programan con `spawn`
+    sin ocuparla. El trabajo bloqueante o intensivo en CPU se delega a `run_blocking`, `run_network` o `run_audio`.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._tasks = set()  # Referencias a las tareas en curso para que no se recolecten
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Ejecuta la corrutina `fn(*args, **kwargs)` cuando haya capacidad libre y retorna su resultado.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            result = await fn(*args, **kwargs)
+            self.completed += 1
+            return result
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    def spawn(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> asyncio.Task:
+        """
+        Programa la corrutina `fn` en segundo plano sin tomar capacidad; debe llamarse desde el
+        bucle de eventos. `fn` toma la capacidad con `run` cuando vaya a procesar un video.
+        """
+        task = asyncio.create_task(fn(*args, **kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+pipeline_scheduler = PipelineScheduler(max_concurrency=int(os.getenv('PIPELINE_MAX_CONCURRENCY', '8')))
+
+# Hilos para el procesamiento de audio (decodificación, ffmpeg, codificación), separados del
+# ejecutor por defecto para que el trabajo de CPU no deje sin hilos a las llamadas bloqueantes de E/S
+audio_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('AUDIO_MAX_WORKERS', str(os.cpu_count() or 2))),
+    thread_name_prefix="audio"
+)
+
+async def run_audio(fn: Callable[..., Any], *args) -> Any:
+    """
+    Ejecuta una función de procesamiento de audio en `audio_executor` sin bloquear el bucle de eventos.
+    """
+    return await asyncio.get_running_loop().run_in_executor(audio_executor, fn, *args)
+
+# Hilos para la E/S de red de larga duración (yt-dlp, descargas y subidas a Blob Storage, subtítulos),
+# separados del ejecutor por defecto para que no dejen sin hilos a las consultas cortas
+network_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('NETWORK_MAX_WORKERS', '16')),
+    thread_name_prefix="network"
+)
+
+async def run_network(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Ejecuta una función bloqueante de E/S de red en `network_executor` sin bloquear el bucle de eventos.
+    """
+    return await asyncio.get_running_loop().run_in_executor(network_executor, functools.partial(fn, *args, **kwargs))
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Ejecuta una función bloqueante de corta duración (SQLite, consultas puntuales a Blob Storage)
+    en el ejecutor por defecto.
+    """
+    return await asyncio.to_thread(fn, *args, **kwargs)
@@ -1,136 +1,198 @@
+import asyncio
+import os
+import time
 from pathlib import Path
-from collections import defaultdict
-from typing import Optional
-from openai import AzureOpenAI
-from azure.ai.contentsafety import ContentSafetyClient
-from azure.ai.textanalytics import TextAnalyticsClient
-from app.utils.file_utils import print_styled_message, read_file, cleanup_temp_files
-from app.utils.text_utils import split_text, split_text_gpt
-from app.services.audio import convert_audio_to_wav, split_audio
-from app.services.azure_clients import initialize_azure_clients
-from app.services.youtube import get_youtube_title
-from app.services.content_safety import analyze_content_safety, display_content_safety_results
-from app.services.translation import translate_text
-from app.services.improvement import improve_transcription
+from typing import Callable, Iterable, Optional, Union
+from openai import AsyncAzureOpenAI
+from app.utils.file_utils import print_styled_message, cleanup_temp_files
+from app.utils.text_utils import merge_transcripts
+from app.services.audio import prepare_transcription_parts, audio_chunk_overlap_ms, audio_backend
+from app.services.scheduler import run_audio, run_blocking, run_network
+from app.services.content_safety import IncrementalSafetyScanner, ContentBlockedError
 from app.services.blob_storage_service import upload_file_to_blob, download_file_from_blob
 from app.models.blob_storage import FileUploadRequest
-from azure.storage.blob import ContainerClient
-import urllib.parse
-from typing import List, Optional
+from app.models.audio import AudioPart
 
-def transcribe_audio(file_url: str, whisper_client: AzureOpenAI, youtube_url: Optional[str] = None) -> str:
+# Paralelismo y reintentos de las llamadas a Whisper
+whisper_max_concurrency = int(os.getenv('WHISPER_MAX_CONCURRENCY', '4'))
+whisper_max_retries = int(os.getenv('WHISPER_MAX_RETRIES', '2'))
+whisper_retry_backoff = float(os.getenv('WHISPER_RETRY_BACKOFF_SECONDS', '2'))
+
+async def transcribe_audio(file_url: str, whisper_client: AsyncAzureOpenAI, trim: bool = False,
+                           safety_scanner: Optional[IncrementalSafetyScanner] = None) -> str:
     """
-    Transcribe un archivo de audio y guarda el resultado en un archivo .txt.
+    Transcribe un archivo de audio y retorna el texto transcrito.
+    El audio se decodifica una sola vez; si `trim` es True también se recorta el silencio inicial.
+    El procesamiento de audio se ejecuta en `audio_executor` para no bloquear el bucle de eventos.
+    Si se recibe `safety_scanner`, cada parte se analiza en cuanto se transcribe y, si el contenido
+    se bloquea, se cancelan las llamadas a Whisper pendientes y se lanza `ContentBlockedError`.
     """
+    file_path, audio_parts = None, None
     try:
-        if youtube_url:
-            video_title = get_youtube_title(youtube_url).rstrip()
+        # Descargar el audio y prepararlo para Whisper con el backend configurado
+        file_path, audio_parts = await run_audio(prepare_transcription_parts, file_url, trim)
+
+        if safety_scanner is None:
+            transcribed_parts = await transcribe_audio_parts(audio_parts, whisper_client)
         else:
-            video_title = Path(file_url).stem
-
-        # Descargar el archivo de Blob Storage
-        file_path = download_file_from_blob(file_url)
-        output_path = Path('reviews') / f"{video_title}.txt"
-
-        if not file_path.exists():
-            raise FileNotFoundError(f"No se encuentra el archivo de audio: {file_path}")
-
-        wav_blob_url = convert_audio_to_wav(str(file_path))
-
-        audio_parts = split_audio(wav_blob_url)
-        transcribed_parts = transcribe_audio_parts(audio_parts, whisper_client)
-
-        transcribed_text = ' '.join(transcribed_parts)
-        
-        # Guardar el archivo de transcripción en la carpeta reviews/
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as file:
-            file.write(transcribed_text)
-        
-        print_styled_message(f"Transcripción guardada temporalmente en: {output_path}")
-
-        # Subir el archivo de transcripción a Blob Storage
-        file_request = FileUploadRequest(
-            filename=f"{video_title}.txt",
-            file_data=transcribed_text.encode('utf-8')
-        )
-        blob_url = upload_file_to_blob(file_request)
-        print_styled_message(f"Transcripción guardada en Blob Storage: {blob_url}")
-
-        # Limpiar archivos temporales
-        cleanup_temp_files(file_path, audio_parts)
-        print_styled_message(f"Se limpiaron los archivos temporales")
-        return str(output_path)        
-        
+            transcription = asyncio.create_task(
+                transcribe_audio_parts(audio_parts, whisper_client, on_part=safety_scanner.submit)
+            )
+            safety_scanner.on_stop = transcription.cancel
+            try:
+                transcribed_parts = await transcription
+            except asyncio.CancelledError:
+                # La transcripción se canceló porque el análisis de seguridad se detuvo
+                if not safety_scanner.stopped or not transcription.cancelled():
+                    raise
+                if safety_scanner.blocked:
+                    print_styled_message("Contenido bloqueado durante la transcripción: se cancelan las partes pendientes")
+                    raise ContentBlockedError(safety_scanner.verdict())
+                raise safety_scanner.error
+
+        # Si las partes se solapan, eliminar las palabras repetidas en los límites
+        if audio_chunk_overlap_ms > 0 and audio_backend == 'pydub':
+            return merge_transcripts(transcribed_parts)
+        return ' '.join(transcribed_parts)
+
     except Exception as e:
         print_styled_message(f"Error en la transcripción: {str(e)}")
         raise
+    finally:
+        # Cerrar el generador de partes (y el ffmpeg asociado) y limpiar los archivos temporales
+        # también si la transcripción falló, se bloqueó o se canceló
+        if audio_parts is not None:
+            await close_audio_parts(audio_parts)
+        if file_path is not None:
+            await run_blocking(cleanup_temp_files, file_path, [file_path])
+            print_styled_message(f"Se limpiaron los archivos temporales")
+
+async def close_audio_parts(audio_parts: Iterable[AudioPart]) -> None:
+    """
+    Cierra el generador de partes de audio, lo que detiene ffmpeg y borra su directorio temporal.
+    Si `audio_executor` aún está generando una parte, espera a que termine antes de cerrarlo.
+    """
+    close = getattr(audio_parts, 'close', None)
+    if close is None:
+        return
+    while True:
+        try:
+            await run_audio(close)
+            return
+        except ValueError:
+            # El generador sigue ejecutándose en otro hilo ("generator already executing")
+            await asyncio.sleep(0.05)
 
-def transcribe_audio_parts(audio_parts: list[str], whisper_client: AzureOpenAI) -> list[str]:
+def save_transcription(transcribed_text: str, name: str) -> str:
+    """
+    Guarda la transcripción en la carpeta reviews/ y la sube a Blob Storage como `<name>.txt`.
+    `name` debe ser único por video (su ID), ya que se procesan varios videos a la vez.
+    Retorna la URL del blob.
+    """
+    output_path = Path('reviews') / f"{name}.txt"
+
+    # Guardar el archivo de transcripción en la carpeta reviews/
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file:
+        file.write(transcribed_text)
+
+    print_styled_message(f"Transcripción guardada temporalmente en: {output_path}")
+
+    # Subir el archivo de transcripción a Blob Storage
+    file_request = FileUploadRequest(
+        filename=f"{name}.txt",
+        file_data=transcribed_text.encode('utf-8')
+    )
+    blob_url = upload_file_to_blob(file_request)
+    print_styled_message(f"Transcripción guardada en Blob Storage: {blob_url}")
+    return blob_url
+
+async def transcribe_audio_parts(audio_parts: Iterable[Union[str, AudioPart]], whisper_client: AsyncAzureOpenAI, max_concurrency: int = None, max_retries: int = None,
+                                 on_part: Optional[Callable[[int, str], None]] = None) -> list[str]:
     """
     Transcribe múltiples partes de audio usando el modelo Whisper de Azure OpenAI.
+
+    Cada parte puede ser la URL de un blob o un `AudioPart` ya codificado en memoria, y
+    `audio_parts` puede ser un generador (se consume en `audio_executor`): cada parte se envía
+    en cuanto está disponible.
+    Las partes se transcriben en paralelo con un máximo de `max_concurrency` llamadas
+    simultáneas y el resultado conserva el orden original de las partes. Si se indica `on_part`,
+    se llama con (índice, texto) en cuanto cada parte termina.
     """
-    transcribed_parts = []
-    total_parts = len(audio_parts)
+    max_concurrency = max_concurrency or whisper_max_concurrency
+    max_retries = whisper_max_retries if max_retries is None else max_retries
+    total_parts = len(audio_parts) if hasattr(audio_parts, '__len__') else None
+    transcribed_parts = {}
 
-    print_styled_message(f"Iniciando transcripción de {total_parts} {'parte' if total_parts == 1 else 'partes'}...")
+    if total_parts is None:
+        print_styled_message("Iniciando transcripción de las partes a medida que se generan...")
+    else:
+        print_styled_message(f"Iniciando transcripción de {total_parts} {'parte' if total_parts == 1 else 'partes'}...")
+    start = time.perf_counter()
 
-    for audio_url in audio_parts:
-        try:
-            # Descargar la parte del audio desde Blob Storage
-            audio_file_path = download_file_from_blob(audio_url)
-            
-            with open(audio_file_path, "rb") as audio:
-                result = whisper_client.audio.transcriptions.create(file=audio, model="whisper")
-                transcribed_parts.append(result.text)
-        except Exception as e:
-            print_styled_message(f"Error al transcribir {audio_url}: {str(e)}")
-            raise
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
 
-    print_styled_message("Transcripción de todas las partes completada")
-    return transcribed_parts
+    async def transcribe_limited(audio_part, idx):
+        async with semaphore:
+            text = await transcribe_audio_part(audio_part, whisper_client, idx, total_parts, max_retries)
+        if on_part:
+            on_part(idx, text)
+        return text
 
-def analyze_and_improve_transcription(text: str, ai_client: TextAnalyticsClient, content_safety_client: ContentSafetyClient, variables: dict) -> str:
-    """
-    Analiza la seguridad del contenido, detecta el idioma, traduce si es necesario y mejora la transcripción.
-    """
-    # Análisis de seguridad del contenido
-    text_parts = split_text(text, 5120)
-    all_safety_results = [
-        analyze_content_safety(content_safety_client, part)
-        for part in text_parts
-    ]
-
-    # Consolidar y mostrar resultados de seguridad
-    consolidated_results = defaultdict(int)
-    for result in all_safety_results:
-        for category, analysis in result.items():
-            if analysis:
-                consolidated_results[category] = max(consolidated_results[category], analysis.severity)
-
-    display_content_safety_results(consolidated_results)
-
-    # Detección de idioma
-    languages = defaultdict(int)
-    for part in text_parts:
-        detected = ai_client.detect_language(documents=[{"id": "1", "text": part}])[0]
-        languages[detected.primary_language.iso6391_name] += 1
-
-    predominant_language = max(languages.items(), key=lambda x: x[1])[0]
-
-    # Traducción si es necesario
-    if predominant_language == 'en':
-        print_styled_message("El texto está en inglés. Se procederá a traducirlo al español.")
-        translated_text = translate_text(text_parts, variables)
-        text_to_improve = translated_text
-        language_to_improve = 'es'
-    else:
-        print_styled_message("El texto está en español. No es necesaria la traducción.")
-        text_to_improve = text
-        language_to_improve = predominant_language
+    tasks = []
+    try:
+        parts_iter = iter(audio_parts)
+        while True:
+            audio_part = await run_audio(next, parts_iter, None)
+            if audio_part is None:
+                break
+            tasks.append(asyncio.create_task(transcribe_limited(audio_part, len(tasks))))
+        for idx, text in enumerate(await asyncio.gather(*tasks)):
+            transcribed_parts[idx] = text
+    except BaseException:
+        # Evitar que se sigan enviando partes pendientes si una falla definitivamente
+        for task in tasks:
+            task.cancel()
+        raise
 
-    # Mejorar el texto
-    print_styled_message("Mejorando el texto...")
-    improved_text = improve_transcription(text_to_improve, ai_client, language=language_to_improve)
+    elapsed = time.perf_counter() - start
+    print_styled_message(f"Transcripción de todas las partes completada en {elapsed:.1f}s")
+    return [transcribed_parts[idx] for idx in range(len(transcribed_parts))]
 
-    return improved_text
\ No newline at end of file
+async def transcribe_audio_part(audio_part: Union[str, AudioPart], whisper_client: AsyncAzureOpenAI, idx: int, total_parts: Optional[int], max_retries: int = 2) -> str:
+    """
+    Transcribe una sola parte de audio, reintentando solo esa parte si falla.
+    """
+    label = f"{idx + 1}/{total_parts}" if total_parts else f"{idx + 1}"
+    audio_url = audio_part.filename if isinstance(audio_part, AudioPart) else audio_part
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        try:
+            if isinstance(audio_part, AudioPart):
+                # La parte ya está codificada en memoria: enviarla directamente
+                result = await whisper_client.audio.transcriptions.create(
+                    file=(audio_part.filename, audio_part.file_data),
+                    model="whisper"
+                )
+            else:
+                # Descargar la parte del audio desde Blob Storage
+                audio_file_path = await run_network(download_file_from_blob, audio_url)
+                audio_data = await run_blocking(Path(audio_file_path).read_bytes)
+                result = await whisper_client.audio.transcriptions.create(
+                    file=(Path(audio_file_path).name, audio_data),
+                    model="whisper"
+                )
+
+            elapsed = time.perf_counter() - start
+            print_styled_message(f"Parte {label} transcrita en {elapsed:.1f}s")
+            return result.text
+        except Exception as e:
+            if attempt >= max_retries:
+                print_styled_message(f"Error al transcribir {audio_url}: {str(e)}")
+                raise
+            delay = whisper_retry_backoff * (2 ** attempt)
+            print_styled_message(
+                f"Error al transcribir la parte {label} (intento {attempt + 1}): {str(e)}. "
+                f"Reintentando en {delay:.1f}s..."
+            )
+            await asyncio.sleep(delay)
@@ -1,11 +1,69 @@
-import requests
+import asyncio
+import re
 import uuid
 import os
+from collections import Counter
+from typing import Optional
+import httpx
 from app.utils.file_utils import print_styled_message
+from app.utils.concurrency import AsyncRateLimiter
+from app.services.scheduler import run_blocking
+from app.services.translation_memory import translation_memory, normalize_segment, segment_key
 
-def translate_text(text_parts: list, clients, target_language: str = "es") -> str:
+# Límites de Azure Translator por petición: elementos del arreglo y caracteres en total. El
+# límite de caracteres se aplica al texto multiplicado por el número de idiomas de destino
+translator_max_elements = int(os.getenv('TRANSLATOR_MAX_ELEMENTS', '1000'))
+translator_max_chars = int(os.getenv('TRANSLATOR_MAX_CHARS_PER_REQUEST', '50000'))
+translator_max_concurrency = int(os.getenv('TRANSLATOR_MAX_CONCURRENCY', '4'))
+translator_max_retries = int(os.getenv('TRANSLATOR_MAX_RETRIES', '3'))
+# Caracteres por segundo que admite la suscripción (0 para no limitar)
+translator_rate_limiter = AsyncRateLimiter(
+    rate_per_second=float(os.getenv('TRANSLATOR_CHARS_PER_SECOND', '0')),
+    burst=translator_max_chars
+)
+
+translation_memory_enabled = os.getenv('TRANSLATION_MEMORY', 'true').lower() == 'true'
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?…])\s+")
+
+def pack_text_parts(text_parts: list[str], target_count: int = 1, max_elements: int = None,
+                    max_chars: int = None) -> list[list[int]]:
     """
-    Traduce el texto completo al idioma objetivo utilizando Azure Translator.
+    Agrupa los índices de las partes en el menor número de peticiones que permiten los límites.
+    """
+    max_elements = max_elements or translator_max_elements
+    max_chars = max_chars or translator_max_chars
+    batches = []
+    batch, batch_chars = [], 0
+    for idx, part in enumerate(text_parts):
+        part_chars = len(part) * target_count
+        if batch and (len(batch) >= max_elements or batch_chars + part_chars > max_chars):
+            batches.append(batch)
+            batch, batch_chars = [], 0
+        batch.append(idx)
+        batch_chars += part_chars
+    if batch:
+        batches.append(batch)
+    return batches
+
+def split_segments(text: str) -> list[str]:
+    """
+    Divide una parte en oraciones, la unidad que se guarda en la memoria de traducción.
+    """
+    return [segment for segment in SENTENCE_PATTERN.split(text.strip()) if segment.strip()] or [text]
+
+async def translate_parts(text_parts: list[str], clients, target_languages: list[str],
+                          source_language: Optional[str] = None,
+                          memory_stats: Optional[Counter] = None) -> dict[str, list[str]]:
+    """
+    Traduce las partes a uno o varios idiomas con Azure Translator y retorna, por idioma,
+    las partes traducidas en el mismo orden.
+
+    Cada parte se divide en oraciones y las que ya están en la memoria de traducción no se
+    vuelven a enviar. El resto se empaqueta en peticiones lo más grandes posible, que se envían
+    en paralelo por el cliente HTTP compartido `clients['translator']`. Si no se indica
+    `source_language`, el servicio detecta el idioma de origen. Si se indica `memory_stats`,
+    se acumulan en él los aciertos y fallos de la memoria.
     """
     translator_key = os.getenv('AZURE_TRANSLATOR_KEY')
     translator_endpoint = os.getenv('AZURE_TRANSLATOR_ENDPOINT')
@@ -14,34 +72,103 @@ def translate_text(text_parts: list, clients, target_language: str = "es") -> st
     if not all([translator_key, translator_endpoint, location]):
         raise ValueError("Faltan variables de entorno para el servicio de traducción")
 
-    path = '/translate'
-    constructed_url = translator_endpoint + path
-
+    constructed_url = translator_endpoint.rstrip('/') + '/translate'
     params = {
         'api-version': '3.0',
-        'from': 'en',
-        'to': [target_language]
+        'to': list(target_languages)
     }
+    if source_language:
+        params['from'] = source_language
+
+    part_segments = [split_segments(part) for part in text_parts]
+    segments = list(dict.fromkeys(normalize_segment(segment) for segments in part_segments for segment in segments))
 
-    headers = {
-        'Ocp-Apim-Subscription-Key': translator_key,
-        'Ocp-Apim-Subscription-Region': location,
-        'Content-type': 'application/json',
-        'X-ClientTraceId': str(uuid.uuid4())
+    # Consultar la memoria de traducción antes de construir las peticiones
+    keys = {
+        (segment, language): segment_key(segment, source_language, language)
+        for segment in segments for language in target_languages
     }
+    remembered = await run_blocking(translation_memory.get_many, list(keys.values())) if translation_memory_enabled else {}
+    translated = {
+        (segment, language): remembered[key]
+        for (segment, language), key in keys.items() if key in remembered
+    }
+    # Una oración se envía si le falta alguno de los idiomas; se traduce a todos en la misma pasada
+    pending = [
+        segment for segment in segments
+        if any((segment, language) not in translated for language in target_languages)
+    ]
 
-    translated_parts = []
+    batches = pack_text_parts(pending, len(target_languages))
+    semaphore = asyncio.Semaphore(translator_max_concurrency)
 
-    print_styled_message("Iniciando la traducción del texto...")
+    print_styled_message(
+        f"Iniciando la traducción de {len(text_parts)} partes a {', '.join(target_languages)}: "
+        f"{len(segments) - len(pending)}/{len(segments)} oraciones en memoria, "
+        f"{len(batches)} {'petición' if len(batches) == 1 else 'peticiones'}..."
+    )
 
-    for idx, part in enumerate(text_parts, 1):
-        body = [{'text': part}]
-        response = requests.post(constructed_url, params=params, headers=headers, json=body)
-        response.raise_for_status()
-        translations = response.json()
-        translated_parts.append(translations[0]['translations'][0]['text'])
-        print_styled_message(f"Parte {idx}/{len(text_parts)} traducida.")
+    async def translate_batch(batch_number: int, indexes: list[int]) -> None:
+        body = [{'text': pending[idx]} for idx in indexes]
+        async with semaphore:
+            await translator_rate_limiter.acquire(sum(len(item['text']) for item in body) * len(target_languages))
+            results = await _post_with_retries(clients['translator'], constructed_url, params, body, {
+                'Ocp-Apim-Subscription-Key': translator_key,
+                'Ocp-Apim-Subscription-Region': location,
+                'Content-type': 'application/json',
+                'X-ClientTraceId': str(uuid.uuid4())
+            })
+        for idx, result in zip(indexes, results):
+            for translation in result['translations']:
+                translated[(pending[idx], translation['to'])] = translation['text']
+        print_styled_message(f"Petición {batch_number}/{len(batches)} traducida ({len(indexes)} oraciones).")
+
+    await asyncio.gather(*(translate_batch(number, indexes) for number, indexes in enumerate(batches, 1)))
+
+    if translation_memory_enabled and pending:
+        await run_blocking(translation_memory.put_many, {
+            keys[(segment, language)]: translated[(segment, language)]
+            for segment in pending for language in target_languages
+            if (segment, language) in translated
+        })
+
+    if memory_stats is not None:
+        memory_stats["segments"] += len(segments)
+        memory_stats["hits"] += len(segments) - len(pending)
+        memory_stats["misses"] += len(pending)
+        memory_stats["chars_sent"] += sum(len(segment) for segment in pending) * len(target_languages)
+        pending_set = set(pending)
+        memory_stats["chars_saved"] += sum(len(segment) for segment in segments if segment not in pending_set) * len(target_languages)
 
     print_styled_message("Traducción completada.")
+    return {
+        language: [
+            ' '.join(translated[(normalize_segment(segment), language)] for segment in segments)
+            for segments in part_segments
+        ]
+        for language in target_languages
+    }
 
-    return ' '.join(translated_parts)
\ No newline at end of file
+async def _post_with_retries(client: httpx.AsyncClient, url: str, params: dict, body: list, headers: dict) -> list:
+    """
+    Envía una petición a Translator, reintentando si el servicio limita la frecuencia (429)
+    o falla temporalmente (5xx).
+    """
+    for attempt in range(translator_max_retries + 1):
+        response = await client.post(url, params=params, headers=headers, json=body)
+        if response.status_code == 429 or response.status_code >= 500:
+            if attempt < translator_max_retries:
+                delay = float(response.headers.get('Retry-After', 2 ** attempt))
+                print_styled_message(f"Translator respondió {response.status_code}. Reintentando en {delay:.1f}s...")
+                await asyncio.sleep(delay)
+                continue
+        response.raise_for_status()
+        return response.json()
+
+async def translate_text(text_parts: list, clients, target_language: str = "es",
+                         source_language: Optional[str] = None) -> str:
+    """
+    Traduce el texto completo al idioma objetivo utilizando Azure Translator.
+    """
+    translated = await translate_parts(text_parts, clients, [target_language], source_language)
+    return ' '.join(translated[target_language])
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def normalize_segment(segment: str) -> str:
+    return WHITESPACE_PATTERN.sub(' ', segment).strip()
+
+def segment_key(segment: str, source_language: Optional[str], target_language: str) -> str:
+    """
+    Clave de un segmento en la memoria: hash del texto normalizado + idioma de origen y de destino.
+    """
+    digest = hashlib.sha256(normalize_segment(segment).encode('utf-8')).hexdigest()
+    return f"{digest}:{source_language or 'auto'}:{target_language}"
+
+class TranslationMemory:
+    """
+    Memoria de traducción persistente en SQLite: guarda la traducción de cada segmento y
+    expulsa los menos usados recientemente cuando se supera `max_entries`.
+    """
+
+    def __init__(self, db_path: str, max_entries: int):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS segments (
+                    key TEXT PRIMARY KEY,
+                    translation TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS segments_last_used ON segments (last_used)")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        """
+        Devuelve las traducciones guardadas para las claves indicadas y marca su uso.
+        """
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock, self._conn:
+            # SQLite admite un número limitado de parámetros por consulta
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, translation FROM segments WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+            self._conn.executemany(
+                "UPDATE segments SET last_used = ? WHERE key = ?",
+                [(time.time(), key) for key in found]
+            )
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, translations: dict[str, str]) -> None:
+        """
+        Guarda nuevas traducciones y aplica el límite de tamaño.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO segments (key, translation, last_used) VALUES (?, ?, ?)",
+                [(key, translation, now) for key, translation in translations.items()]
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM segments WHERE key IN (SELECT key FROM segments ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "max_entries": self.max_entries,
+            }
+
+translation_memory = TranslationMemory(
+    db_path=os.getenv('TRANSLATION_MEMORY_PATH', '/tmp/translation_memory.db'),
+    max_entries=int(os.getenv('TRANSLATION_MEMORY_MAX_ENTRIES', '100000'))
+)
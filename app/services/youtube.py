@@ -1,44 +1,126 @@
+import os
+import re
+import copy
+import html
+import requests
 import yt_dlp
 from pathlib import Path
+from typing import Iterator, Optional, Union
 from app.utils.file_utils import print_styled_message
-from app.services.blob_storage_service import upload_file_to_blob, download_file_from_blob
+from app.utils.cache import TTLCache
+from app.services.blob_storage_service import upload_file_to_blob, upload_stream_to_blob, download_file_from_blob
 from app.models.blob_storage import FileUploadRequest
+from app.models.youtube import VideoMetadata, CaptionTrack
 
-def download_youtube_audio(url: str) -> str:
+# Modo de descarga: 'fast' descarga el flujo de solo audio más pequeño apto para voz en su
+# contenedor original (sin transcodificar); 'mp3' mantiene la conversión a MP3 de 192 kbps
+youtube_audio_mode = os.getenv('YOUTUBE_AUDIO_MODE', 'fast')
+youtube_fast_audio_format = os.getenv(
+    'YOUTUBE_AUDIO_FORMAT',
+    'bestaudio[acodec=opus][abr<=64]/bestaudio[ext=m4a][abr<=96]/worstaudio[abr>=32]/bestaudio/best'
+)
+# Metadatos extraídos por yt-dlp, reutilizados por ID de video durante `YOUTUBE_METADATA_TTL_SECONDS`
+metadata_cache = TTLCache(
+    maxsize=int(os.getenv('YOUTUBE_METADATA_CACHE_SIZE', '256')),
+    ttl=float(os.getenv('YOUTUBE_METADATA_TTL_SECONDS', '1800'))
+)
+
+VIDEO_ID_PATTERN = re.compile(
+    r'(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:.*&)?v=|embed/|shorts/|live/|v/)|youtu\.be/)([0-9A-Za-z_-]{11})'
+)
+
+# Uso de subtítulos existentes en lugar de Whisper: 'off', 'manual' (solo subidos por el
+# creador) o 'auto' (también los generados automáticamente, sin traducción automática)
+caption_policy = os.getenv('CAPTION_POLICY', 'manual')
+# Idiomas preferidos, en orden; con CAPTION_REQUIRE_LANGUAGE_MATCH solo se aceptan estos
+caption_languages = [lang.strip() for lang in os.getenv('CAPTION_LANGUAGES', 'es,en').split(',') if lang.strip()]
+caption_require_language_match = os.getenv('CAPTION_REQUIRE_LANGUAGE_MATCH', 'false').lower() == 'true'
+CAPTION_FORMATS = ['json3', 'vtt', 'srv3']
+
+# Tamaño de cada petición por rangos al descargar directamente el flujo de audio
+youtube_range_chunk_size = int(os.getenv('YOUTUBE_RANGE_CHUNK_MB', '10')) * 1024 * 1024
+
+def extract_video_id(url: str) -> Optional[str]:
     """
-    Descarga el audio de un video de YouTube y lo guarda en formato MP3.
+    Obtiene el ID de 11 caracteres de una URL de YouTube, o None si no se reconoce.
     """
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'outtmpl': '/tmp/audio01.%(ext)s',  # Guardar temporalmente en /tmp
-        'quiet': True,
-    }
+    match = VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def get_video_metadata(url: str) -> VideoMetadata:
+    """
+    Extrae los metadatos del video una sola vez y los reutiliza desde la caché por ID de video.
+    """
+    video_id = extract_video_id(url)
+    cached = metadata_cache.get(video_id or url)
+    if cached is not None:
+        return cached
+
+    ydl_opts = {'quiet': True}
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info_dict = ydl.sanitize_info(ydl.extract_info(url, download=False, process=False))
+
+    metadata = VideoMetadata(
+        id=info_dict['id'],
+        title=(info_dict.get('title') or info_dict['id']).rstrip(),
+        duration=info_dict.get('duration'),
+        language=info_dict.get('language'),
+        webpage_url=info_dict.get('webpage_url') or url,
+        formats=info_dict.get('formats') or [],
+        subtitles=info_dict.get('subtitles') or {},
+        automatic_captions=info_dict.get('automatic_captions') or {},
+        info=info_dict
+    )
+    metadata_cache.set(metadata.id, metadata)
+    if video_id is None:
+        metadata_cache.set(url, metadata)
+    return metadata
+
+def resolve_video_info(metadata: VideoMetadata, ydl: yt_dlp.YoutubeDL, download: bool = False) -> dict:
+    """
+    Aplica la selección de formato de `ydl` sobre los metadatos ya extraídos, sin volver a consultar YouTube.
+    """
+    return ydl.process_ie_result(copy.deepcopy(metadata.info), download=download)
+
+def download_youtube_audio(video: Union[str, VideoMetadata], mode: str = None) -> str:
+    """
+    Descarga el audio de un video de YouTube y lo sube a Blob Storage.
+
+    En modo 'fast' el flujo de audio se envía a Blob Storage mientras se descarga, sin
+    pasar por disco ni transcodificar. En modo 'mp3' se guarda en formato MP3 como antes.
+    """
+    mode = mode or youtube_audio_mode
+    metadata = video if isinstance(video, VideoMetadata) else get_video_metadata(video)
 
     print_styled_message("Iniciando la descarga del audio del video de YouTube...")
 
     try:
+        if mode == 'fast':
+            return download_youtube_audio_fast(metadata)
+
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            }],
+            'outtmpl': '/tmp/%(id)s.%(ext)s',  # Guardar temporalmente en /tmp
+            'quiet': True,
+        }
+
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+            info_dict = resolve_video_info(metadata, ydl, download=True)
 
         print_styled_message("Descarga completada. Procesando el archivo de audio...")
-        mp3_file = Path('/tmp/audio01.mp3')
+        mp3_file = Path(f"/tmp/{info_dict['id']}.mp3")
 
         if not mp3_file.exists():
             raise FileNotFoundError(f"No se pudo encontrar el archivo descargado: {mp3_file}")
 
-        # Leer el archivo MP3 y subirlo a Blob Storage
+        # Subir el archivo MP3 a Blob Storage por bloques, sin leerlo completo en memoria
         with open(mp3_file, 'rb') as f:
-            file_data = f.read()
-        file_request = FileUploadRequest(
-            filename="audio01.mp3",  # Asegurarse de que el nombre del archivo sea correcto
-            file_data=file_data
-        )
-        blob_url = upload_file_to_blob(file_request)
+            blob_url = upload_stream_to_blob(mp3_file.name, f)
         print_styled_message(f"Archivo subido a Blob Storage: {blob_url}")
 
         return blob_url
@@ -47,11 +129,165 @@ def download_youtube_audio(url: str) -> str:
         print_styled_message(f"Error durante la descarga: {str(e)}")
         raise
 
-def get_youtube_title(url: str) -> str:
+def download_youtube_audio_fast(metadata: VideoMetadata) -> str:
     """
-    Obtiene el título del video de YouTube.
+    Sube a Blob Storage el flujo de solo audio más pequeño apto para voz, en su contenedor
+    original. Si el formato elegido se sirve por HTTP se transmite directamente a Blob Storage;
+    si no (p. ej. HLS/DASH), yt-dlp lo descarga a /tmp sin postprocesado y luego se sube.
     """
-    ydl_opts = {'quiet': True}
+    ydl_opts = {
+        'format': youtube_fast_audio_format,
+        'outtmpl': '/tmp/%(id)s.%(ext)s',
+        'quiet': True,
+    }
+
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info_dict = ydl.extract_info(url, download=False)
-        return info_dict.get('title')
\ No newline at end of file
+        info_dict = resolve_video_info(metadata, ydl)
+        filename = f"{info_dict['id']}.{info_dict['ext']}"
+        print_styled_message(
+            f"Formato de audio seleccionado: {info_dict.get('format_id')} "
+            f"({info_dict.get('acodec')}, {info_dict.get('abr')} kbps, {info_dict['ext']})"
+        )
+
+        if info_dict.get('protocol') in ('http', 'https') and info_dict.get('url'):
+            chunks = iter_http_ranges(info_dict['url'], info_dict.get('http_headers') or {},
+                                      total_size=info_dict.get('filesize'))
+            blob_url = upload_stream_to_blob(filename, chunks)
+        else:
+            ydl.process_info(info_dict)
+            local_file = Path(ydl.prepare_filename(info_dict))
+            if not local_file.exists():
+                raise FileNotFoundError(f"No se pudo encontrar el archivo descargado: {local_file}")
+            with open(local_file, 'rb') as f:
+                blob_url = upload_stream_to_blob(filename, f)
+            local_file.unlink(missing_ok=True)
+
+    print_styled_message(f"Archivo subido a Blob Storage: {blob_url}")
+    return blob_url
+
+def iter_http_ranges(url: str, headers: dict, chunk_size: int = None, total_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Descarga un recurso HTTP en peticiones por rangos consecutivos y entrega los bytes a medida que llegan.
+    El tamaño total se toma de la cabecera `Content-Range` o, si no viene, de `total_size`.
+    """
+    chunk_size = chunk_size or youtube_range_chunk_size
+    with requests.Session() as session:
+        start = 0
+        while total_size is None or start < total_size:
+            range_headers = {**headers, 'Range': f"bytes={start}-{start + chunk_size - 1}"}
+            with session.get(url, headers=range_headers, stream=True, timeout=60) as response:
+                # Un 416 tras el primer rango indica que el recurso terminó justo en el rango anterior
+                if response.status_code == 416 and start > 0:
+                    break
+                response.raise_for_status()
+                total_size = parse_content_range_total(response.headers.get('Content-Range')) or total_size
+                received = 0
+                for piece in response.iter_content(chunk_size=256 * 1024):
+                    received += len(piece)
+                    yield piece
+
+            # Un 200 significa que el servidor ignoró el rango y envió el recurso completo
+            if response.status_code != 206 or received == 0 or (total_size is None and received < chunk_size):
+                break
+            start += received
+
+def parse_content_range_total(content_range: Optional[str]) -> Optional[int]:
+    """
+    Extrae el tamaño total de una cabecera `Content-Range` (`bytes 0-99/1234`), o None si es desconocido.
+    """
+    match = re.match(r'bytes\s+\d+-\d+/(\d+)', content_range or '')
+    return int(match.group(1)) if match else None
+
+def get_youtube_title(url: str) -> str:
+    """
+    Obtiene el título del video de YouTube (a partir de los metadatos en caché).
+    """
+    return get_video_metadata(url).title
+
+def select_caption_track(metadata: VideoMetadata, policy: str = None, languages: list[str] = None,
+                         require_language_match: bool = None) -> Optional[CaptionTrack]:
+    """
+    Elige la pista de subtítulos aceptable según la política, o None si no hay ninguna.
+    Se prefieren los subtítulos del creador, el idioma original del video y luego los idiomas indicados.
+    """
+    policy = policy or caption_policy
+    languages = caption_languages if languages is None else languages
+    require_language_match = caption_require_language_match if require_language_match is None else require_language_match
+    if policy == 'off':
+        return None
+
+    sources = [('manual', metadata.subtitles)]
+    if policy == 'auto':
+        sources.append(('auto', metadata.automatic_captions))
+
+    # El idioma original del video va primero: una pista en otro idioma sería una traducción
+    original = [metadata.language] if metadata.language else []
+    preferred = original + [lang for lang in languages if lang not in original]
+    for kind, tracks_by_language in sources:
+        candidates = [lang for lang in preferred if lang in tracks_by_language]
+        if kind == 'auto':
+            # En los automáticos la pista original se publica como "<idioma>-orig"
+            candidates = [f"{lang}-orig" for lang in preferred if f"{lang}-orig" in tracks_by_language] + candidates
+        if not require_language_match:
+            candidates += [lang for lang in tracks_by_language if lang not in candidates and lang != 'live_chat']
+
+        for language in candidates:
+            # Descartar traducciones automáticas de otra pista (llevan el parámetro tlang)
+            formats = [f for f in tracks_by_language[language] if 'tlang=' not in (f.get('url') or '')]
+            for ext in CAPTION_FORMATS:
+                track = next((f for f in formats if f.get('ext') == ext and f.get('url')), None)
+                if track:
+                    return CaptionTrack(language=language.removesuffix('-orig'), kind=kind, ext=ext, url=track['url'])
+    return None
+
+def fetch_caption_text(track: CaptionTrack) -> str:
+    """
+    Descarga una pista de subtítulos y la convierte en texto plano, sin marcas de tiempo,
+    etiquetas ni las líneas repetidas que generan los subtítulos en desplazamiento.
+    """
+    response = requests.get(track.url, timeout=30)
+    response.raise_for_status()
+
+    if track.ext == 'json3':
+        lines = [
+            ''.join(seg.get('utf8', '') for seg in event.get('segs', []))
+            for event in response.json().get('events', [])
+        ]
+    elif track.ext == 'srv3':
+        lines = re.findall(r'<p\b[^>]*>(.*?)</p>', response.text, flags=re.DOTALL)
+    else:
+        lines = [
+            line for line in response.text.splitlines()
+            if line.strip() and '-->' not in line and not line.startswith(('WEBVTT', 'Kind:', 'Language:', 'NOTE'))
+            and not line.strip().isdigit()
+        ]
+
+    cleaned = []
+    for line in lines:
+        text = html.unescape(re.sub(r'<[^>]+>', '', line))
+        text = re.sub(r'\[(?:music|música|applause|aplausos)\]', '', text, flags=re.IGNORECASE)
+        text = ' '.join(text.split())
+        if text and (not cleaned or cleaned[-1] != text):
+            cleaned.append(text)
+    return ' '.join(cleaned)
+
+def get_caption_transcript(metadata: VideoMetadata, policy: str = None) -> tuple[Optional[str], Optional[str]]:
+    """
+    Intenta obtener la transcripción a partir de subtítulos existentes.
+    Retorna (texto, origen) con origen del tipo 'captions:manual:es', o (None, None).
+    """
+    track = select_caption_track(metadata, policy)
+    if track is None:
+        return None, None
+
+    try:
+        text = fetch_caption_text(track)
+    except Exception as e:
+        print_styled_message(f"No se pudieron descargar los subtítulos ({track.language}): {str(e)}")
+        return None, None
+
+    if not text:
+        return None, None
+
+    print_styled_message(f"Usando subtítulos {track.kind} en '{track.language}' en lugar de transcribir el audio")
+    return text, f"captions:{track.kind}:{track.language}"
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+class AsyncSingleFlight:
+    """
+    Agrupa corrutinas concurrentes con la misma clave: solo la primera ejecuta la función y
+    las demás esperan y reciben su mismo resultado (o su misma excepción).
+    """
+
+    def __init__(self):
+        self._calls = {}  # clave -> asyncio.Task
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> tuple[Any, bool]:
+        """
+        Ejecuta `await fn(...)` para `key` o se une a la ejecución en curso.
+        Retorna (resultado, si el resultado fue compartido con otra llamada).
+
+        El trabajo compartido corre en su propia tarea y todas las llamadas la esperan protegida
+        con `asyncio.shield`, de modo que cancelar a quien la inició no cancela a los demás.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            return await asyncio.shield(task), True
+
+        task = asyncio.create_task(fn(*args, **kwargs))
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), False
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Evitar el aviso de excepción no recuperada si nadie más esperaba
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> list:
+        return list(self._calls)
+
+class AsyncRateLimiter:
+    """
+    Cubo de fichas para asyncio: limita cuántas unidades (peticiones, caracteres, tokens...)
+    se consumen por segundo, permitiendo ráfagas de hasta `burst` unidades.
+    Con `rate_per_second` igual a 0 no limita.
+    """
+
+    def __init__(self, rate_per_second: float, burst: float = None):
+        self.rate_per_second = rate_per_second
+        self.burst = burst or rate_per_second
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self, amount: float = 1) -> None:
+        """
+        Espera hasta poder consumir `amount` unidades. Una petición mayor que `burst` se
+        admite cuando el cubo está lleno, para no bloquearla indefinidamente.
+        """
+        if self.rate_per_second <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            amount = min(amount, self.burst)
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate_per_second)
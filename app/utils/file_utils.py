@@ -2,6 +2,8 @@ from pathlib import Path
 from azure.storage.blob import BlobServiceClient
 from azure.core.exceptions import ResourceNotFoundError
 from urllib.parse import urlparse, unquote
+from app.models.audio import SilenceMap
+import numpy as np
 import os
 
 def print_styled_message(message: str, color: str = "", style: str = "") -> None:
@@ -35,12 +37,76 @@ def cleanup_temp_files(file_path: Path, audio_parts: list[str]):
         print_styled_message(f"Error al limpiar archivos temporales: {str(e)}")
         raise
 
+# Muestras que se pasan a coma flotante a la vez al calcular la energía por ventana
+FRAME_BLOCK_SAMPLES = 1 << 20
+
+def frame_dbfs(sound, frame_ms=10) -> np.ndarray:
+    """
+    Calcula en una sola pasada el nivel dBFS de cada ventana de `frame_ms` milisegundos.
+    Las muestras se procesan por bloques de ventanas completas, de modo que la memoria
+    adicional no crece con la duración del audio.
+    """
+    assert frame_ms > 0
+    samples = np.asarray(sound.get_array_of_samples())
+    samples_per_frame = max(1, int(sound.frame_rate * frame_ms / 1000)) * sound.channels
+    if samples.size == 0:
+        return np.empty(0)
+
+    frame_count = -(-samples.size // samples_per_frame)
+    energy = np.empty(frame_count)
+    block = samples_per_frame * max(1, FRAME_BLOCK_SAMPLES // samples_per_frame)
+    for start in range(0, samples.size, block):
+        chunk = samples[start:start + block].astype(np.float64)
+        first_frame = start // samples_per_frame
+        full = chunk.size - chunk.size % samples_per_frame
+        frames = chunk[:full].reshape(-1, samples_per_frame)
+        energy[first_frame:first_frame + len(frames)] = np.einsum('ij,ij->i', frames, frames)
+        # Solo el último bloque puede terminar en una ventana incompleta
+        if full < chunk.size:
+            rest = chunk[full:]
+            energy[-1] = np.dot(rest, rest)
+
+    counts = np.full(frame_count, samples_per_frame, dtype=np.float64)
+    counts[-1] = samples.size - (frame_count - 1) * samples_per_frame
+    rms = np.sqrt(energy / counts)
+
+    with np.errstate(divide='ignore'):
+        return 20 * np.log10(rms / sound.max_possible_amplitude)
+
+def detect_silence_map(sound, silence_threshold_in_decibels=-20.0, min_silence_len=500, frame_ms=10) -> SilenceMap:
+    """
+    Analiza el audio una sola vez y devuelve el silencio inicial, el final y los silencios
+    internos de al menos `min_silence_len` milisegundos.
+    """
+    duration_ms = len(sound)
+    silent = frame_dbfs(sound, frame_ms) < silence_threshold_in_decibels
+    voiced = np.flatnonzero(~silent)
+
+    if voiced.size == 0:
+        return SilenceMap(duration_ms=duration_ms, leading_ms=duration_ms, trailing_ms=duration_ms, regions=[])
+
+    leading_ms = int(voiced[0]) * frame_ms
+    trailing_ms = max(0, duration_ms - (int(voiced[-1]) + 1) * frame_ms)
+
+    # Inicio y fin de cada tramo de ventanas silenciosas entre el primer y el último sonido
+    inner = silent[voiced[0]:voiced[-1] + 1].astype(np.int8)
+    edges = np.diff(np.concatenate(([0], inner, [0])))
+    run_starts = np.flatnonzero(edges == 1) + voiced[0]
+    run_ends = np.flatnonzero(edges == -1) + voiced[0]
+
+    regions = [
+        (int(start) * frame_ms, int(end) * frame_ms)
+        for start, end in zip(run_starts, run_ends)
+        if (end - start) * frame_ms >= min_silence_len
+    ]
+    return SilenceMap(duration_ms=duration_ms, leading_ms=leading_ms, trailing_ms=trailing_ms, regions=regions)
+
 def milliseconds_until_sound(sound, silence_threshold_in_decibels=-20.0, chunk_size=10):
     """
     Devuelve el número de milisegundos hasta el primer sonido.
     """
-    trim_ms = 0  # ms
-    assert chunk_size > 0  # para evitar bucles infinitos
-    while sound[trim_ms:trim_ms + chunk_size].dBFS < silence_threshold_in_decibels and trim_ms < len(sound):
-        trim_ms += chunk_size
-    return trim_ms
\ No newline at end of file
+    assert chunk_size > 0  # para evitar ventanas vacías
+    levels = frame_dbfs(sound, chunk_size)
+    voiced = np.flatnonzero(levels >= silence_threshold_in_decibels)
+    first_sound = voiced[0] if voiced.size else levels.size
+    return int(first_sound) * chunk_size
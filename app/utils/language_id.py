@@ -0,0 +1,71 @@
+import re
+from collections import Counter
+from typing import Optional
+
+# Palabras vacías más frecuentes de cada idioma. Algunas se repiten entre idiomas parecidos:
+# esas cuentan para ambos y reducen el margen, de modo que los textos ambiguos no se
+# clasifican localmente
+STOPWORDS = {
+    'en': {
+        'the', 'and', 'of', 'to', 'a', 'is', 'in', 'that', 'it', 'for', 'with', 'you', 'this', 'was',
+        'on', 'are', 'be', 'have', 'not', 'we', 'they', 'at', 'but', 'so', 'what', 'can', 'just',
+        'there', 'about', 'if', 'my', 'your', 'know', 'like', 'do', 'all', 'or', 'from', 'he', 'she',
+        'his', 'her', 'would', 'because', 'going', 'really', 'which', 'their', 'were', 'been', 'has',
+    },
+    'es': {
+        'el', 'la', 'los', 'las', 'de', 'que', 'y', 'en', 'un', 'una', 'por', 'con', 'para', 'es',
+        'no', 'lo', 'del', 'al', 'se', 'su', 'pero', 'más', 'como', 'muy', 'está', 'este', 'esta',
+        'esto', 'también', 'porque', 'cuando', 'hay', 'yo', 'ya', 'todo', 'eso', 'sí', 'fue', 'ser',
+        'tiene', 'hacer', 'nosotros', 'usted', 'entonces', 'aquí', 'bueno', 'puede', 'son', 'me',
+    },
+    'pt': {
+        'o', 'a', 'os', 'as', 'de', 'que', 'e', 'do', 'da', 'dos', 'das', 'em', 'um', 'uma', 'para',
+        'com', 'não', 'por', 'mais', 'como', 'mas', 'foi', 'ao', 'ele', 'ela', 'isso', 'está',
+        'muito', 'também', 'já', 'eu', 'você', 'quando', 'então', 'aqui', 'tem', 'são', 'nos', 'no',
+        'na', 'seu', 'sua',
+    },
+    'fr': {
+        'le', 'la', 'les', 'de', 'des', 'du', 'et', 'un', 'une', 'est', 'que', 'qui', 'dans', 'pour',
+        'pas', 'ne', 'sur', 'au', 'aux', 'avec', 'ce', 'il', 'elle', 'nous', 'vous', 'je', 'mais',
+        'ou', 'très', 'aussi', 'cette', 'son', 'sont', 'on', 'tout', 'été', 'être', 'fait', 'comme',
+    },
+    'it': {
+        'il', 'lo', 'la', 'gli', 'le', 'di', 'che', 'e', 'è', 'un', 'una', 'per', 'non', 'con', 'del',
+        'della', 'dei', 'nel', 'nella', 'sono', 'anche', 'ma', 'come', 'più', 'questo', 'questa',
+        'molto', 'io', 'noi', 'loro', 'ci', 'perché', 'quando', 'allora', 'qui', 'ha', 'essere',
+    },
+    'de': {
+        'der', 'die', 'das', 'und', 'ist', 'nicht', 'ein', 'eine', 'zu', 'den', 'dem', 'mit', 'von',
+        'sich', 'auf', 'für', 'auch', 'es', 'ich', 'sie', 'wir', 'aber', 'wenn', 'noch', 'wie',
+        'so', 'was', 'dass', 'sind', 'war', 'hat', 'haben', 'werden', 'kann', 'nur', 'oder', 'im',
+    },
+}
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+def identify_language(text: str, min_tokens: int = 30, min_coverage: float = 0.2, min_margin: float = 2.0) -> tuple[Optional[str], float]:
+    """
+    Identifica el idioma de un texto contando sus palabras vacías.
+
+    Retorna (idioma, confianza). El idioma es None cuando el resultado no es fiable: el texto
+    es demasiado corto (`min_tokens`), pocas palabras son palabras vacías del idioma ganador
+    (`min_coverage`) o el segundo idioma está demasiado cerca (`min_margin` veces menos aciertos).
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if len(tokens) < min_tokens:
+        return None, 0.0
+
+    frequencies = Counter(tokens)
+    hits = {
+        language: sum(frequencies[word] for word in stopwords)
+        for language, stopwords in STOPWORDS.items()
+    }
+    ranked = sorted(hits.items(), key=lambda item: item[1], reverse=True)
+    (language, best), (_, second) = ranked[0], ranked[1]
+
+    coverage = best / len(tokens)
+    margin = best / second if second else float('inf')
+    confidence = min(1.0, coverage / min_coverage) * min(1.0, margin / min_margin)
+    if coverage < min_coverage or margin < min_margin:
+        return None, confidence
+    return language, confidence
@@ -1,4 +1,9 @@
+import re
 from app.utils.file_utils import print_styled_message
+from app.utils.tokenizer import count_tokens, split_by_tokens
+
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?…])\s+")
 
 def split_text(text: str, max_length: int) -> list:
     """
@@ -13,23 +18,76 @@ def split_text(text: str, max_length: int) -> list:
 def split_text_gpt(text: str, max_tokens: int) -> list:
     """
     Divide el texto en fragmentos que no excedan el límite de tokens.
+
+    Los tokens se cuentan con el tokenizador del modelo y los fragmentos se llenan hasta el
+    límite cortando entre párrafos u oraciones; solo una oración que por sí sola supera el
+    límite se corta por tokens.
     """
     try:
-        words = text.split()
+        # Unidades: (oración, separador que la precede dentro de un fragmento)
+        units = []
+        for paragraph in PARAGRAPH_PATTERN.split(text.strip()):
+            sentences = [sentence for sentence in SENTENCE_PATTERN.split(paragraph.strip()) if sentence]
+            for idx, sentence in enumerate(sentences):
+                separator = ' ' if idx else '\n\n'
+                if count_tokens(sentence) > max_tokens:
+                    for piece_idx, piece in enumerate(split_by_tokens(sentence, max_tokens)):
+                        units.append((piece, separator if piece_idx == 0 else ' '))
+                else:
+                    units.append((sentence, separator))
+
         chunks = []
         current_chunk = []
+        current_tokens = 0
 
-        for word in words:
-            if len(current_chunk) + len(word.split()) > max_tokens:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
-            else:
-                current_chunk.append(word)
+        for sentence, separator in units:
+            # Un token de margen por el separador y por las uniones entre oraciones
+            sentence_tokens = count_tokens(sentence) + 1
+            if current_chunk and current_tokens + sentence_tokens > max_tokens:
+                chunks.append(''.join(current_chunk).strip())
+                current_chunk = []
+                current_tokens = 0
+            current_chunk.append(f"{separator}{sentence}" if current_chunk else sentence)
+            current_tokens += sentence_tokens
 
         if current_chunk:
-            chunks.append(' '.join(current_chunk))
+            chunks.append(''.join(current_chunk).strip())
 
         return chunks
     except Exception as e:
         print_styled_message(f"Error al dividir el texto para GPT: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def merge_transcripts(parts: list[str], max_overlap_words: int = 30, min_overlap_words: int = 2, max_skip_words: int = 3) -> str:
+    """
+    Une las transcripciones de partes de audio solapadas eliminando las palabras repetidas
+    en cada límite: se busca la secuencia más larga al final de una parte que se repita al
+    comienzo de la siguiente (ignorando mayúsculas y puntuación).
+    """
+    try:
+        merged_words = []
+        for part in parts:
+            words = part.split()
+            if not merged_words:
+                merged_words.extend(words)
+                continue
+
+            tail = [_normalize_word(w) for w in merged_words[-max_overlap_words:]]
+            head = [_normalize_word(w) for w in words[:max_overlap_words + max_skip_words]]
+            drop = 0
+            # La siguiente parte puede empezar con una palabra cortada, por eso se permite saltar algunas
+            for size in range(min(len(tail), len(head)), min_overlap_words - 1, -1):
+                matches = [skip for skip in range(max_skip_words + 1) if head[skip:skip + size] == tail[-size:]]
+                if matches:
+                    drop = matches[0] + size
+                    break
+
+            merged_words.extend(words[drop:])
+
+        return ' '.join(merged_words)
+    except Exception as e:
+        print_styled_message(f"Error al unir las transcripciones: {str(e)}")
+        raise
+
+def _normalize_word(word: str) -> str:
+    return ''.join(c for c in word.lower() if c.isalnum())
@@ -0,0 +1,79 @@
+import math
+import os
+import re
+from pathlib import Path
+from app.utils.file_utils import print_styled_message
+
+# El vocabulario BPE se busca primero en la carpeta del proyecto (la imagen de Docker y el
+# paquete de despliegue lo incluyen), para no depender de la red al arrancar
+os.environ.setdefault('TIKTOKEN_CACHE_DIR', str(Path(__file__).resolve().parents[2] / 'tiktoken_cache'))
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Codificación de gpt-35-turbo-instruct
+tokenizer_encoding_name = os.getenv('GPT_TOKENIZER_ENCODING', 'cl100k_base')
+
+WORD_PATTERN = re.compile(r"\S+")
+
+# Vocabulario cargado por `load_encoding`; mientras sea None los tokens se estiman
+_encoding = None
+
+def load_encoding():
+    """
+    Carga el vocabulario BPE (bloqueante: puede descargarlo si no está en la caché local).
+    Retorna None si no está disponible, en cuyo caso los tokens se estiman.
+    """
+    global _encoding
+    if _encoding is not None:
+        return _encoding
+    if tiktoken is None:
+        print_styled_message("tiktoken no está instalado: los tokens se estimarán a partir del texto")
+        return None
+    try:
+        _encoding = tiktoken.get_encoding(tokenizer_encoding_name)
+    except Exception as e:
+        print_styled_message(f"No se pudo cargar el vocabulario {tokenizer_encoding_name}: {str(e)}. Los tokens se estimarán a partir del texto")
+    return _encoding
+
+def get_encoding():
+    """
+    Retorna el vocabulario ya cargado, o None si todavía no está disponible. Nunca lo descarga.
+    """
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """
+    Cuenta los tokens del texto. Sin vocabulario usa una estimación conservadora
+    (la mayor entre 4/3 de tokens por palabra y 1 token por cada 3 caracteres).
+    """
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    words = len(WORD_PATTERN.findall(text))
+    return max(math.ceil(words * 4 / 3), math.ceil(len(text) / 3))
+
+def split_by_tokens(text: str, max_tokens: int) -> list[str]:
+    """
+    Corta un texto en trozos de como máximo `max_tokens` tokens, sin respetar oraciones.
+    Se usa solo para oraciones que por sí solas no caben en un fragmento.
+    """
+    encoding = get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+    # Sin vocabulario: cortar por palabras (y las palabras demasiado largas, por caracteres)
+    max_chars = max_tokens * 3
+    words = [word[i:i + max_chars] for word in text.split() for i in range(0, len(word), max_chars)]
+    pieces, current = [], []
+    for word in words:
+        if current and count_tokens(' '.join(current + [word])) > max_tokens:
+            pieces.append(' '.join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(' '.join(current))
+    return pieces
@@ -1,11 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.endpoints import transcribe
+from app.api.endpoints import transcribe, metrics, jobs
+from app.services.jobs import resume_jobs
+from app.services.azure_clients import azure_client_registry
+from app.services.improvement import preload_tokenizer
 import os
 import uvicorn
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crear los clientes de Azure una sola vez y abrir sus conexiones antes de la primera petición
+    await azure_client_registry.start()
+    await azure_client_registry.warm_up()
+    # Cargar el vocabulario del tokenizador fuera del bucle de eventos, con límite de tiempo
+    await preload_tokenizer()
+    # Retomar los trabajos que quedaron pendientes antes del último reinicio
+    maintenance = resume_jobs()
+    yield
+    maintenance.cancel()
+    await azure_client_registry.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(transcribe.router, prefix="/api/v1/transcribe", tags=["transcribe"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["jobs"])
+app.include_router(metrics.router, prefix="/api/v1/metrics", tags=["metrics"])
 
 @app.get("/")
 def read_root():
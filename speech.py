@@ -14,6 +14,7 @@ import uuid
 import json
 import yt_dlp
 from pydub import AudioSegment
+import numpy as np
 
 def print_styled_message(message: str, color: str = "", style: str = "") -> None:
     """
@@ -25,11 +26,21 @@ def milliseconds_until_sound(sound, silence_threshold_in_decibels=-20.0, chunk_s
     """
     Devuelve el número de milisegundos hasta el primer sonido.
     """
-    trim_ms = 0  # ms
-    assert chunk_size > 0  # para evitar bucles infinitos
-    while sound[trim_ms:trim_ms + chunk_size].dBFS < silence_threshold_in_decibels and trim_ms < len(sound):
-        trim_ms += chunk_size
-    return trim_ms
+    assert chunk_size > 0  # para evitar ventanas vacías
+    samples = np.asarray(sound.get_array_of_samples(), dtype=np.float64)
+    if samples.size == 0:
+        return 0
+
+    # Nivel dBFS de cada ventana de `chunk_size` ms calculado en una sola pasada
+    samples_per_chunk = max(1, int(sound.frame_rate * chunk_size / 1000)) * sound.channels
+    starts = np.arange(0, samples.size, samples_per_chunk)
+    rms = np.sqrt(np.add.reduceat(samples * samples, starts) / np.diff(np.append(starts, samples.size)))
+    with np.errstate(divide='ignore'):
+        levels = 20 * np.log10(rms / sound.max_possible_amplitude)
+
+    voiced = np.flatnonzero(levels >= silence_threshold_in_decibels)
+    first_sound = voiced[0] if voiced.size else levels.size
+    return int(first_sound) * chunk_size
 
 def trim_start(filepath, silence_threshold_in_decibels=-20.0, min_silence_len=2000):
     """
@@ -368,12 +379,26 @@ def display_content_safety_results(results: dict) -> None:
 
 def detect_language(ai_client: TextAnalyticsClient, text_parts: list) -> str:
     """
-    Detecta el idioma predominante en el texto.
+    Detecta el idioma predominante en el texto, enviando varias partes por llamada.
     """
     languages = defaultdict(int)
+    batch_size = 1000  # Documentos por petición admitidos por Text Analytics
+    max_request_chars = 450000  # Margen bajo el límite de 1 MB por petición
+    batch, batch_chars = [], 0
+    batches = []
     for part in text_parts:
-        detected = ai_client.detect_language(documents=[{"id": "1", "text": part}])[0]
-        languages[detected.primary_language.iso6391_name] += 1
+        if batch and (len(batch) >= batch_size or batch_chars + len(part) > max_request_chars):
+            batches.append(batch)
+            batch, batch_chars = [], 0
+        batch.append({"id": str(len(batch)), "text": part})
+        batch_chars += len(part)
+    if batch:
+        batches.append(batch)
+
+    for documents in batches:
+        for detected in ai_client.detect_language(documents=documents):
+            if not detected.is_error:
+                languages[detected.primary_language.iso6391_name] += 1
 
     predominant_language = max(languages.items(), key=lambda x: x[1])[0]
     return predominant_language
@@ -539,12 +564,7 @@ def main():
         display_content_safety_results(consolidated_results)
 
         # Detección de idioma
-        languages = defaultdict(int)
-        for part in text_parts:
-            detected = ai_client.detect_language(documents=[{"id": "1", "text": part}])[0]
-            languages[detected.primary_language.iso6391_name] += 1
-
-        predominant_language = max(languages.items(), key=lambda x: x[1])[0]
+        predominant_language = detect_language(ai_client, text_parts)
 
         # Traducción si es necesario
         if predominant_language == 'en':